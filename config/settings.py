@@ -47,11 +47,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CustomerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -95,6 +98,49 @@ DATABASES = {
     }
 }
 
+# Replicas are added to DATABASES under their own alias, with
+# 'TEST': {'MIRROR': 'default'}, and listed in STORE_READ_REPLICAS. Safe
+# requests to viewsets that set use_read_replica read from one of them (see
+# core.middleware.ReplicaRoutingMiddleware), everything else uses default.
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+
+STORE_READ_REPLICAS = []
+
+# How long reads stay on the primary after a client writes.
+STORE_REPLICA_STICKY_SECONDS = 15
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Any shared backend works in production, e.g.
+# 'django.core.cache.backends.redis.RedisCache' with LOCATION 'redis://127.0.0.1:6379'.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+STORE_RESPONSE_CACHE_TIMEOUT = 60 * 5
+
+# Admin changelists of bigger tables page on the estimated row count.
+STORE_ADMIN_COUNT_ESTIMATE_THRESHOLD = 100_000
+
+# Bulk product endpoints (store.bulk_products): largest accepted payload, and
+# rows written per statement and transaction.
+STORE_PRODUCT_BULK_MAX_ROWS = 10_000
+
+STORE_PRODUCT_BULK_BATCH_SIZE = 1000
+
+# 'store.carts.RedisCartStore' keeps carts in Redis at STORE_CART_REDIS_URL.
+STORE_CART_BACKEND = 'store.carts.ORMCartStore'
+
+STORE_CART_REDIS_URL = 'redis://127.0.0.1:6379/1'
+
+# Seconds a cart may go without item changes before it is deleted, by the
+# reap_carts command for the ORM store and by key expiry in Redis.
+STORE_CART_TTL = 60 * 60 * 24 * 14
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -140,16 +186,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-    'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'core.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+    'core.renderers.ORJSONRenderer',
+    'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+    'core.parsers.ORJSONParser',
+    'rest_framework.parsers.FormParser',
+    'rest_framework.parsers.MultiPartParser',
     ),
 }
 
 
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT', ),
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=1)
+    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'core.authentication.CustomerTokenObtainPairSerializer',
 }
 
+# How long core.authentication.CachedJWTAuthentication keeps a user's row.
+# Saving or deleting the user drops it right away.
+STORE_AUTH_USER_CACHE_TIMEOUT = 60
+
+# Keeps user permissions in the cache (see core.backends), which is cleared by
+# bumping a version stamp whenever groups or permission assignments change.
+AUTHENTICATION_BACKENDS = ['core.backends.CachedModelBackend']
+
+STORE_PERMISSION_CACHE_TIMEOUT = 60 * 60
+
 DJOSER = {
     'SERIALIZERS': {
         'user_create': 'core.serializers.UserCreateSerializer',
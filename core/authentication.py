@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+# Authenticated requests build request.user from a cached row instead of
+# loading it from the database. The row carries the customer id too. Cached
+# rows are dropped when the user or its customer is saved or deleted (see
+# core.signals) and expire after STORE_AUTH_USER_CACHE_TIMEOUT anyway.
+
+USER_KEY = 'core:user:{}'
+CUSTOMER_ID_CLAIM = 'customer_id'
+
+
+def get_user_fields():
+    # The password hash is left out of the cache. It is loaded on access like
+    # any deferred field, and saving the user then leaves it alone.
+    return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname != 'password']
+
+
+def get_cached_user(user_id):
+    User = get_user_model()
+    fields = get_user_fields()
+    key = USER_KEY.format(user_id)
+    row = cache.get(key)
+    if row is None:
+        row = User.objects \
+            .filter(**{api_settings.USER_ID_FIELD: user_id}) \
+            .values_list(*fields, 'customer__id') \
+            .first()
+        if row is None:
+            return None
+        cache.set(key, row, settings.STORE_AUTH_USER_CACHE_TIMEOUT)
+    *values, customer_id = row
+    user = User.from_db('default', fields, values)
+    user._customer_id = customer_id
+    return user
+
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+def forget_users(user_ids):
+    cache.delete_many([USER_KEY.format(user_id) for user_id in user_ids])
+
+
+# None for users without a Customer row, such as staff accounts or users
+# whose customers were flushed by setup_fake_data.
+def get_customer_id(user):
+    # Users from CachedJWTAuthentication already know it, others (sessions,
+    # force_authenticate) look it up once.
+    if not hasattr(user, '_customer_id'):
+        from store.models import Customer
+        user._customer_id = Customer.objects.filter(user_id=user.id).values_list('id', flat=True).first()
+    return user._customer_id
+
+
+def get_customer(user):
+    if not user.is_authenticated:
+        return None
+    customer_id = get_customer_id(user)
+    if customer_id is None:
+        return None
+    from store.models import Customer
+    customer = Customer.objects.filter(pk=customer_id).first()
+    if customer is not None:
+        customer.user = user
+    return customer
+
+
+# The claim is for clients. The server goes by the cached row, which follows
+# customers being deleted while the token is still valid.
+class CustomerTokenObtainPairSerializer(TokenObtainPairSerializer):
+    # Refreshed access tokens copy the claim from the refresh token.
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[CUSTOMER_ID_CLAIM] = get_customer_id(user)
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # Revocation compares the password hash, which is not cached.
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from store.caching import bump_version, get_versions
+
+# ModelBackend only keeps a user's permissions on the user instance, which
+# authentication builds anew for every request, so each has_perm() check
+# reloads them. This keeps them in the shared cache instead, under a version
+# stamp that is bumped whenever group memberships or permission assignments
+# change (see core.signals). is_superuser is part of the key since it grants
+# every permission.
+
+PERMISSIONS_VERSION = 'auth.permissions'
+PERMISSIONS_KEY = 'core:permissions:{}:{}:{}'
+
+
+def bump_permissions_version():
+    bump_version(PERMISSIONS_VERSION)
+
+
+class CachedModelBackend(ModelBackend):
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            version, = get_versions([PERMISSIONS_VERSION])
+            key = PERMISSIONS_KEY.format(user_obj.pk, int(user_obj.is_superuser), version)
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set(key, permissions, settings.STORE_PERMISSION_CACHE_TIMEOUT)
+            user_obj._perm_cache = permissions
+        return user_obj._perm_cache
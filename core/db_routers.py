@@ -0,0 +1,19 @@
+from contextvars import ContextVar
+
+# Alias of the replica the current request reads from, set by
+# ReplicaRoutingMiddleware. None reads from the primary.
+read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        # Explicitly, since Django would otherwise write an instance back to
+        # the replica it was read from.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
@@ -0,0 +1,67 @@
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+from store.models import Order, OrderItem, Product
+from store.serializers import OrderForAdminSerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Compares JSONRenderer and ORJSONRenderer throughput on large order and product lists, and checks they render the same bytes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows per payload, existing rows are repeated to fill it')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        orders = Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        ).select_related('customer__user')[:1000]
+        payloads = {
+            'orders (admin)': OrderForAdminSerializer(orders, many=True).data,
+            'products': ProductSerializer(Product.objects.select_related('category')[:1000], many=True).data,
+        }
+
+        renderers = {'json': JSONRenderer(), 'orjson': ORJSONRenderer()}
+        self.stdout.write(f"{'payload':<16} {'rows':>7} {'MB':>7} {'json ms':>9} {'orjson ms':>10} {'json MB/s':>10} {'orjson MB/s':>12}")
+        for name, rows in payloads.items():
+            if not rows:
+                raise CommandError("No rows, run setup_fake_data first.")
+            data = (list(rows) * (options['rows'] // len(rows) + 1))[:options['rows']]
+
+            rendered = {}
+            timings = {}
+            for renderer_name, renderer in renderers.items():
+                samples = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    rendered[renderer_name] = renderer.render(data)
+                    samples.append(time.perf_counter() - start)
+                timings[renderer_name] = statistics.median(samples)
+
+            if rendered['json'] != rendered['orjson']:
+                raise CommandError(f"{name}: ORJSONRenderer output differs from JSONRenderer")
+            megabytes = len(rendered['json']) / 1000000
+            self.stdout.write(
+                f"{name:<16} {len(data):>7} {megabytes:>7.2f} {timings['json'] * 1000:>9.1f} {timings['orjson'] * 1000:>10.1f} "
+                f"{megabytes / timings['json']:>10.1f} {megabytes / timings['orjson']:>12.1f}"
+            )
+
+            parse_timings = {}
+            for parser_name, parser in [('json', JSONParser()), ('orjson', ORJSONParser())]:
+                samples = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    parsed = parser.parse(io.BytesIO(rendered['orjson']))
+                    samples.append((time.perf_counter() - start) * 1000)
+                parse_timings[parser_name] = statistics.median(samples)
+                if len(parsed) != len(data):
+                    raise CommandError(f"{name}: {type(parser).__name__} read back {len(parsed)} rows")
+            self.stdout.write(f"{'':<16} parsing back: {parse_timings['json']:.1f} ms json, {parse_timings['orjson']:.1f} ms orjson")
@@ -0,0 +1,54 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from core.metrics import registry
+
+METRICS_MIDDLEWARE = 'core.middleware.RequestMetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = "Measures the overhead of RequestMetricsMiddleware on the /store/products/ list and fails above --max-overhead percent"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/store/products/')
+        parser.add_argument('--requests', type=int, default=10000)
+        parser.add_argument('--cold', action='store_true', help='Vary the query string so the response cache always misses')
+        parser.add_argument('--max-overhead', type=float, default=2.0, help='Percent')
+
+    def handle(self, *args, **options):
+        middleware = [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]
+        # The middleware loads when a client sends its first request, so each
+        # client keeps the stack it was created under.
+        clients = {}
+        for name, stack in [('without', middleware), ('with', [METRICS_MIDDLEWARE] + middleware)]:
+            with override_settings(MIDDLEWARE=stack):
+                # A non-internal address keeps the debug toolbar out of the measurements.
+                clients[name] = Client(SERVER_NAME='localhost', REMOTE_ADDR='203.0.113.1')
+                clients[name].get(options['path'])
+
+        # Alternating single requests, in alternating order, spreads drift
+        # (cache, CPU frequency) evenly over both sides. The lower decile is
+        # compared since noise from the rest of the machine only adds time.
+        timings = {'without': [], 'with': []}
+        for number in range(options['requests']):
+            for name, client in sorted(clients.items(), reverse=number % 2):
+                start = time.perf_counter()
+                client.get(options['path'], {'nocache': number} if options['cold'] else None)
+                timings[name].append((time.perf_counter() - start) * 1000000)
+
+        without = statistics.quantiles(timings['without'], n=10)[0]
+        with_metrics = statistics.quantiles(timings['with'], n=10)[0]
+        overhead = (with_metrics - without) / without * 100
+        self.stdout.write(
+            f"{options['path']}: p10 {without:.1f}us without, {with_metrics:.1f}us with metrics, "
+            f"{overhead:+.2f}% overhead"
+        )
+
+        recorded = sum(histograms[0].count for histograms in registry.series.values())
+        self.stdout.write(f"Recorded {recorded} requests.")
+        if overhead > options['max_overhead']:
+            raise CommandError(f"Overhead {overhead:.2f}% is above {options['max_overhead']}%")
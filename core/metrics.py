@@ -0,0 +1,76 @@
+import threading
+from bisect import bisect_left
+
+# Request metrics aggregated in process and rendered in the Prometheus text
+# format. Every worker process keeps its own numbers, so scrape each worker
+# (or let the scraper sum them up).
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = [
+    # name, help, buckets
+    ('http_request_duration_seconds', 'Time spent handling the request', DURATION_BUCKETS),
+    ('http_request_db_queries', 'SQL queries run by the request', QUERY_BUCKETS),
+    ('http_request_db_duration_seconds', 'Time spent in SQL queries by the request', DURATION_BUCKETS),
+    ('http_response_size_bytes', 'Size of the response body, streaming responses excluded', SIZE_BUCKETS),
+]
+LABELS = ('view', 'method', 'status')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    # Takes one value per entry of METRICS, in the same order. None skips it.
+    def observe(self, labels, values):
+        with self.lock:
+            histograms = self.series.get(labels)
+            if histograms is None:
+                histograms = self.series[labels] = [Histogram(buckets) for _, _, buckets in METRICS]
+            for histogram, value in zip(histograms, values):
+                if value is not None:
+                    histogram.observe(value)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for index, (name, help_text, buckets) in enumerate(METRICS):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histograms in sorted(self.series.items()):
+                    histogram = histograms[index]
+                    label_text = ','.join(f'{key}="{escape(value)}"' for key, value in zip(LABELS, labels))
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label_text}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label_text}}} {histogram.count}')
+            return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
@@ -0,0 +1,183 @@
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+
+from .authentication import get_customer
+from .db_routers import read_database
+from .metrics import registry
+
+current_queries = ContextVar('current_queries', default=None)
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+
+def record_query(execute, sql, params, many, context):
+    queries = current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.duration += time.perf_counter() - start
+        queries.count += 1
+
+
+# The wrapper stays installed on every connection and only records while a
+# request is being measured. Entering connection.execute_wrapper() for every
+# alias on every request costs more than the rest of the middleware.
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Records latency, SQL query count and time, and response size per view,
+# cheap enough to leave on in production, unlike the debug toolbar.
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(None, connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        queries = QueryTimer()
+        token = current_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        self.observe(request, response, queries, time.perf_counter() - start)
+        return response
+
+    # Queries run by the async ORM happen in a worker thread, which gets a
+    # copy of the context and so records into the same QueryTimer.
+    async def __acall__(self, request):
+        queries = QueryTimer()
+        token = current_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        self.observe(request, response, queries, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, queries, duration):
+        # CommonMiddleware has set Content-Length on every non-streaming
+        # response by now, which saves joining the content again.
+        size = response.headers.get('Content-Length')
+        match = request.resolver_match
+        registry.observe(
+            (match.view_name if match else 'unmatched', request.method, str(response.status_code)),
+            (duration, queries.count, queries.duration, None if size is None else int(size)),
+        )
+
+
+# Sends the reads of safe requests to views that set use_read_replica to one
+# of STORE_READ_REPLICAS. A successful write sets a cookie that keeps the
+# client's reads on the primary for STORE_REPLICA_STICKY_SECONDS, so it sees
+# its own changes despite replication lag.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+    sticky_cookie = 'use_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Otherwise Django runs the sync process_view in a thread.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = read_database.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        self.set_sticky_cookie(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = read_database.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        self.set_sticky_cookie(request, response)
+        return response
+
+    def set_sticky_cookie(self, request, response):
+        if request.method not in self.safe_methods and response.status_code < 400:
+            response.set_cookie(
+                self.sticky_cookie, '1',
+                max_age=settings.STORE_REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.route_reads(request, view_func)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.route_reads(request, view_func)
+
+    def route_reads(self, request, view_func):
+        replicas = settings.STORE_READ_REPLICAS
+        # The flag is on the viewset class, or on the view itself for plain
+        # function views.
+        view = getattr(view_func, 'cls', view_func)
+        if (
+            replicas
+            and request.method in self.safe_methods
+            and getattr(view, 'use_read_replica', False)
+            and self.sticky_cookie not in request.COOKIES
+        ):
+            read_database.set(random.choice(replicas))
+
+
+# Gives views request.customer, loaded on first access and at most once per
+# request. It reads request.user when accessed, so on DRF views it sees the
+# user the view authenticated. Anonymous requests get a falsy proxy of None.
+class CustomerMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request.customer = SimpleLazyObject(lambda: get_customer(request.user))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.customer = SimpleLazyObject(lambda: get_customer(request.user))
+        return await self.get_response(request)
@@ -0,0 +1,36 @@
+import decimal
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+encoder = JSONEncoder()
+
+
+def default(obj):
+    # Matches COERCE_DECIMAL_TO_STRING = False. orjson writes datetimes, dates,
+    # times and UUIDs itself; the rest falls back to DRF's encoder.
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return encoder.default(obj)
+
+
+# Same output as JSONRenderer for compact responses, written by orjson.
+# Indented and ASCII-only output, which orjson cannot produce, falls back to
+# the stdlib renderer.
+class ORJSONRenderer(JSONRenderer):
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if not self.compact or self.ensure_ascii or self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=default, option=self.options)
+        # Same as JSONRenderer, keeps the output a strict javascript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
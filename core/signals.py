@@ -1,6 +1,43 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+from store.models import Customer
 from store.signals import order_created
 
+from .authentication import forget_user
+from .backends import bump_permissions_version
+
 @receiver(order_created)
 def after_order_created(sender, **kwargs):
-    print(f'New order is created {kwargs["order"].id}')
\ No newline at end of file
+    print(f'New order is created {kwargs["order"].id}')
+
+
+# After commit, so a request racing the write can't cache the old row again.
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def forget_changed_user(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_user(instance.pk))
+
+
+# The cached row carries the customer id.
+@receiver([post_save, post_delete], sender=Customer)
+def forget_customer_user(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_user(instance.user_id))
+
+
+# Superusers have every permission, so new ones count too. Deletes cascade
+# to the m2m rows without sending m2m_changed.
+@receiver([post_save, post_delete], sender=Permission)
+@receiver(post_delete, sender=Group)
+def permissions_changed(sender, **kwargs):
+    transaction.on_commit(bump_permissions_version)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def permission_assignments_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(bump_permissions_version)
@@ -1,3 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from store.models import Category, Customer, Order, Product
+
+
+class CustomerClaimTests(TestCase):
+    def setUp(self):
+        # Cached user rows would outlive the rolled back users.
+        cache.clear()
+        self.user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pw-Secret-123')
+        self.client = APIClient()
+
+    def log_in(self):
+        response = self.client.post('/auth/jwt/create/', {'username': 'buyer', 'password': 'pw-Secret-123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"JWT {response.json()['access']}")
+        return AccessToken(response.json()['access'])
+
+    def test_token_carries_customer_id(self):
+        token = self.log_in()
+        self.assertEqual(token['customer_id'], Customer.objects.get(user=self.user).id)
+        self.assertEqual(self.client.get('/store/customers/me/').json()['user'], self.user.id)
+
+    def test_user_without_customer(self):
+        Customer.objects.filter(user=self.user).delete()
+        token = self.log_in()
+        self.assertIsNone(token['customer_id'])
+        self.assertEqual(self.client.get('/store/customers/me/').status_code, 404)
+        self.assertEqual(self.client.get('/store/orders/').json(), [])
+        cart = self.client.post('/store/carts/').json()
+        self.assertEqual(self.client.post('/store/orders/', {'cart_id': cart['id']}, format='json').status_code, 400)
+
+    def test_saving_user_drops_cached_row(self):
+        self.log_in()
+        self.client.get('/store/customers/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/store/customers/me/').status_code, 401)
+
+    def test_deleted_customer_with_a_valid_token(self):
+        token = self.log_in()
+        self.assertIsNotNone(token['customer_id'])
+        self.client.get('/store/customers/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.filter(user=self.user).get().delete()
+        self.assertEqual(self.client.get('/store/customers/me/').status_code, 404)
+        cart = self.client.post('/store/carts/').json()
+        product = Product.objects.create(
+            name='Mug', slug='mug', description='', unit_price='9.50', inventory=10,
+            category=Category.objects.create(title='Kitchen'),
+        )
+        self.client.post(f"/store/carts/{cart['id']}/items/", {'product': product.id, 'quantity': 1}, format='json')
+        response = self.client.post('/store/orders/', {'cart_id': cart['id']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
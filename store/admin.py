@@ -1,10 +1,21 @@
 from django.contrib import admin, messages
-from django.db.models import Count
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.http import urlencode
 
 from . import models
+from .counters import refresh_order_totals
+from .paginations import EstimatedCountPaginator
+
+
+# Changelists of tables that grow to millions of rows: the page count comes
+# from the table statistics, and no second COUNT(*) runs for the "N total"
+# link next to the filtered count. Subclasses list the relations they show
+# in list_select_related rather than counting or prefetching them.
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class InventoryFilter(admin.SimpleListFilter):
@@ -31,8 +42,8 @@ class InventoryFilter(admin.SimpleListFilter):
 
 
 @admin.register(models.Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'inventory', 'unit_price', 'inventory_status', 'product_category', 'num_of_comments']
+class ProductAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'inventory', 'unit_price', 'inventory_status', 'product_category', 'num_of_comments', 'num_of_pending_comments']
     list_per_page = 10
     list_editable = ['unit_price']
     list_select_related = ['category']
@@ -43,13 +54,6 @@ class ProductAdmin(admin.ModelAdmin):
         'slug': ['name', ]
     }
 
-    def get_queryset(self, request):
-        return super().get_queryset(request) \
-                .prefetch_related('comments') \
-                .annotate(
-                    comments_count=Count('comments'),
-                )
-
     def inventory_status(self, product):
         if product.inventory < 10:
             return 'Low'
@@ -57,16 +61,24 @@ class ProductAdmin(admin.ModelAdmin):
             return 'High'
         return 'Medium'
     
-    @admin.display(description='# comments', ordering='comments_count')
+    @admin.display(description='# comments', ordering='approved_comment_count')
     def num_of_comments(self, product):
+        return self.comments_link(product, models.Comment.COMMENT_STATUS_APPROVED, product.approved_comment_count)
+
+    @admin.display(description='# pending comments', ordering='pending_comment_count')
+    def num_of_pending_comments(self, product):
+        return self.comments_link(product, models.Comment.COMMENT_STATUS_WAITING, product.pending_comment_count)
+
+    def comments_link(self, product, status, count):
         url = (
             reverse('admin:store_comment_changelist') 
             + '?'
             + urlencode({
                 'product__id': product.id,
+                'status__exact': status,
             })
         )
-        return format_html('<a href="{}">{}</a>', url, product.comments_count)
+        return format_html('<a href="{}">{}</a>', url, count)
         
     
     @admin.display(ordering='category__title')
@@ -85,10 +97,12 @@ class ProductAdmin(admin.ModelAdmin):
     
 
 @admin.register(models.Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ['id', 'product', 'status', ]
     list_editable = ['status']
+    list_filter = ['status']
     list_per_page = 10
+    list_select_related = ['product']
     autocomplete_fields = ['product', ]
 
 
@@ -97,37 +111,40 @@ class OrderItemInline(admin.TabularInline):
     fields = ['product', 'quantity', 'unit_price']
     extra = 0
     min_num = 1
+    autocomplete_fields = ['product', ]
 
 
 @admin.register(models.Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'customer', 'status', 'datetime_created', 'num_of_items']
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'customer', 'status', 'datetime_created', 'num_of_items', 'total_price']
     list_editable = ['status']
     list_per_page = 10
+    list_select_related = ['customer__user']
+    autocomplete_fields = ['customer', ]
+    search_fields = ['=id', ]
     ordering = ['-datetime_created']
     inlines = [OrderItemInline]
+    readonly_fields = ['total_price', 'item_count']
 
-    def get_queryset(self, request):
-        return super() \
-                .get_queryset(request) \
-                .prefetch_related('items') \
-                .annotate(
-                    items_count=Count('items')
-                )
-
-    @admin.display(ordering='items_count', description='# items')
+    @admin.display(ordering='item_count', description='# items')
     def num_of_items(self, order):
-        return order.items_count
+        return order.item_count
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # The inline may have changed the items behind the stored totals.
+        refresh_order_totals(models.Order.objects.filter(pk=form.instance.pk))
 
 admin.site.register(models.Category)
 
 
 @admin.register(models.Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ['first_name', 'last_name', 'email', ]
     list_per_page = 10
+    list_select_related = ['user']
     ordering = ['user__last_name', 'user__first_name', ]
-    search_fields = ['user_first_name__istartswith', 'user_last_name__istartswith', ]
+    search_fields = ['user__first_name__istartswith', 'user__last_name__istartswith', ]
 
     def first_name(self, customer):
         return customer.user.first_name
@@ -140,9 +157,10 @@ class CustomerAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdmin):
     list_display = ['order', 'product', 'quantity', 'unit_price']
-    autocomplete_fields = ['product', ]
+    list_select_related = ['order', 'product']
+    autocomplete_fields = ['order', 'product', ]
 
 
 class CartItemInline(admin.TabularInline):
@@ -150,9 +168,32 @@ class CartItemInline(admin.TabularInline):
     fields = ['id', 'product', 'quantity']
     extra = 0
     min_num = 1
+    autocomplete_fields = ['product', ]
 
 
 @admin.register(models.Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['id', 'created_at']
     inlines = [CartItemInline]
+
+
+@admin.register(models.OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event', 'status', 'attempts', 'available_at', 'datetime_created', 'datetime_processed']
+    list_filter = ['status', 'event']
+    list_per_page = 50
+    readonly_fields = ['event', 'payload', 'attempts', 'last_error', 'delivered_to', 'datetime_created', 'datetime_processed']
+    actions = ['retry']
+
+    @admin.action(description='Retry')
+    def retry(self, request, queryset):
+        # A fresh set of attempts. delivered_to is kept, so receivers that got
+        # the event already aren't run again.
+        update_count = queryset.update(
+            status=models.OutboxEvent.STATUS_PENDING, available_at=timezone.now(), attempts=0, last_error='',
+        )
+        self.message_user(
+            request,
+            f'{update_count} of events queued for retry.',
+            messages.SUCCESS,
+        )
@@ -0,0 +1,136 @@
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rest_framework import serializers
+
+from .exports import start_of_day
+from .models import DailyCategorySales, DailyProductSales, Order, OrderItem, RollupWatermark
+
+# Daily revenue and units per product and per category, kept in rollup
+# tables so the analytics endpoint never scans orders. refresh_sales_rollups()
+# only recomputes the days of orders created or changed since its last run,
+# found through Order.datetime_modified and a stored watermark.
+
+WATERMARK = 'sales_rollups'
+
+
+def get_changed_days(since, until):
+    orders = Order.objects.filter(datetime_modified__lte=until)
+    if since is not None:
+        orders = orders.filter(datetime_modified__gt=since)
+    return sorted(
+        orders
+            .annotate(day=TruncDate('datetime_created'))
+            .order_by()
+            .values_list('day', flat=True)
+            .distinct()
+    )
+
+
+def day_ranges(days):
+    # Consecutive days become one datetime range, so the lookup can use an
+    # index on Order.datetime_created instead of truncating every row.
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [(start_of_day(start), start_of_day(end)) for start, end in ranges]
+
+
+def rebuild_days(days):
+    # Whole days are recomputed from the orders instead of applying deltas,
+    # so status changes and edited items come out right without knowing the
+    # previous state of the order.
+    product_rows = OrderItem.objects \
+        .exclude(order__status=Order.ORDER_STATUS_CANCELED) \
+        .filter(reduce(or_, [
+            Q(order__datetime_created__gte=start, order__datetime_created__lt=end)
+            for start, end in day_ranges(days)
+        ])) \
+        .annotate(day=TruncDate('order__datetime_created')) \
+        .order_by() \
+        .values('day', 'product_id', 'product__category_id') \
+        .annotate(revenue=Sum(F('quantity') * F('unit_price')), units=Sum('quantity'))
+
+    product_sales = []
+    category_sales = {}
+    for row in product_rows:
+        product_sales.append(DailyProductSales(
+            day=row['day'],
+            product_id=row['product_id'],
+            category_id=row['product__category_id'],
+            revenue=row['revenue'],
+            units=row['units'],
+        ))
+        key = (row['day'], row['product__category_id'])
+        if key not in category_sales:
+            category_sales[key] = DailyCategorySales(day=row['day'], category_id=row['product__category_id'], revenue=0, units=0)
+        category_sales[key].revenue += row['revenue']
+        category_sales[key].units += row['units']
+
+    with transaction.atomic():
+        DailyProductSales.objects.filter(day__in=days).delete()
+        DailyCategorySales.objects.filter(day__in=days).delete()
+        DailyProductSales.objects.bulk_create(product_sales, batch_size=1000)
+        DailyCategorySales.objects.bulk_create(category_sales.values(), batch_size=1000)
+    return len(product_sales)
+
+
+def refresh_sales_rollups(lag_seconds=60, days_per_batch=31, full=False):
+    days_per_batch = max(1, days_per_batch)
+    # Orders modified in the last lag_seconds are left for the next run, so
+    # a checkout that commits after its datetime_modified is not skipped.
+    until = timezone.now() - timedelta(seconds=lag_seconds)
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    since = None if full or watermark is None else watermark.value
+
+    if since is not None and since >= until:
+        return [], 0
+
+    days = get_changed_days(since, until)
+    rows = 0
+    for start in range(0, len(days), days_per_batch):
+        rows += rebuild_days(days[start:start + days_per_batch])
+    if full:
+        # Days without any order left (all canceled or deleted) go away too.
+        DailyProductSales.objects.exclude(day__in=days).delete()
+        DailyCategorySales.objects.exclude(day__in=days).delete()
+
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': until})
+    return days, rows
+
+
+class SalesAnalyticsQuerySerializer(serializers.Serializer):
+    group_by = serializers.ChoiceField(choices=['day', 'category', 'product'], default='day')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    category = serializers.IntegerField(required=False)
+
+
+def get_sales(group_by, date_from=None, date_to=None, category=None):
+    if group_by == 'product':
+        rows = DailyProductSales.objects.values('product_id', 'product__name', 'category_id')
+        ordering = ['-revenue', 'product_id']
+    else:
+        rows = DailyCategorySales.objects.all()
+        if group_by == 'category':
+            rows = rows.values('category_id', 'category__title')
+            ordering = ['-revenue', 'category_id']
+        else:
+            rows = rows.values('day')
+            ordering = ['day']
+
+    if date_from:
+        rows = rows.filter(day__gte=date_from)
+    if date_to:
+        rows = rows.filter(day__lte=date_to)
+    if category is not None:
+        rows = rows.filter(category_id=category)
+    return rows.annotate(revenue=Sum('revenue'), units=Sum('units')).order_by(*ordering)
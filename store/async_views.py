@@ -0,0 +1,141 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from core.renderers import ORJSONRenderer
+from .caching import aget_or_compute
+from .carts import get_cart_store
+from .models import Category, Product
+from .paginations import KeysetPagination
+from .row_serializers import CategoryRowSerializer, ProductRowSerializer, serialize_cart, serialize_cart_item
+from .views import CategoryViewSet, ProductViewSet
+
+# Async versions of the catalog and cart read endpoints, for ASGI workers.
+# They give the same responses as the sync viewsets: querysets come from the
+# viewsets' own get_queryset() and filter backends, which only build SQL, and
+# the rows are fetched with the async ORM and shaped by the row serializers.
+# Catalog responses go through the viewsets' response cache and are
+# invalidated by the same version stamps.
+
+renderer = ORJSONRenderer()
+
+
+def async_api_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            data = await view(Request(request), *args, **kwargs)
+            status = 200
+        except (Http404, APIException) as exc:
+            response = exception_handler(exc, {})
+            data, status = response.data, response.status_code
+        return HttpResponse(renderer.render(data), content_type=renderer.media_type, status=status)
+    return wrapper
+
+
+def get_viewset(viewset_class, request, action, **kwargs):
+    # Keyword arguments are strings, as the router passes them.
+    kwargs = {name: str(value) for name, value in kwargs.items()}
+    return viewset_class(request=request, action=action, args=(), kwargs=kwargs, format_kwarg=None)
+
+
+async def cached(view, compute):
+    async def compute_data():
+        return await compute(), None
+
+    data, _ = await aget_or_compute(
+        await view.aget_response_cache_key(view.request), compute_data, view.get_response_cache_timeout(),
+    )
+    return data
+
+
+async def paginate(view, queryset, row_serializer):
+    pagination = view.paginator
+    if isinstance(pagination, KeysetPagination):
+        rows = await sync_to_async(pagination.paginate_queryset)(queryset, view.request, view)
+        return pagination.get_paginated_response(row_serializer.to_representation(rows)).data
+
+    # DefaultPagination's pages and links, with the count and the page rows
+    # fetched asynchronously instead of by the paginator.
+    paginator = pagination.django_paginator_class(queryset, pagination.get_page_size(view.request))
+    paginator.count = await queryset.acount()
+    page_number = pagination.get_page_number(view.request, paginator)
+    try:
+        pagination.page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    pagination.request = view.request
+    rows = [row async for row in pagination.page.object_list]
+    return pagination.get_paginated_response(row_serializer.to_representation(rows)).data
+
+
+async def get_row(row_serializer, queryset, model, pk):
+    row = await row_serializer.get_rows(queryset.filter(pk=pk)).afirst()
+    if row is None:
+        raise Http404(f'No {model._meta.object_name} matches the given query.')
+    return row_serializer.to_representation([row])[0]
+
+
+@async_api_view
+async def product_list(request):
+    view = get_viewset(ProductViewSet, request, 'list')
+    row_serializer = ProductRowSerializer()
+    return await cached(view, lambda: paginate(
+        view, row_serializer.get_rows(view.filter_queryset(view.get_queryset())), row_serializer,
+    ))
+
+
+@async_api_view
+async def product_detail(request, pk):
+    view = get_viewset(ProductViewSet, request, 'retrieve', pk=pk)
+    return await cached(view, lambda: get_row(ProductRowSerializer(), view.get_queryset(), Product, pk))
+
+
+@async_api_view
+async def category_list(request):
+    view = get_viewset(CategoryViewSet, request, 'list')
+    row_serializer = CategoryRowSerializer()
+
+    async def compute():
+        return row_serializer.to_representation([
+            row async for row in row_serializer.get_rows(view.filter_queryset(view.get_queryset()))
+        ])
+
+    return await cached(view, compute)
+
+
+@async_api_view
+async def category_detail(request, pk):
+    view = get_viewset(CategoryViewSet, request, 'retrieve', pk=pk)
+    return await cached(view, lambda: get_row(CategoryRowSerializer(), view.get_queryset(), Category, pk))
+
+
+@async_api_view
+async def cart_detail(request, pk):
+    cart = await get_cart_store().aget_cart(pk)
+    if cart is None:
+        raise Http404
+    return serialize_cart(cart)
+
+
+@async_api_view
+async def cart_item_list(request, cart_pk):
+    return [serialize_cart_item(item) for item in await get_cart_store().aget_items(cart_pk)]
+
+
+@async_api_view
+async def cart_item_detail(request, cart_pk, pk):
+    item = await get_cart_store().aget_item(cart_pk, pk)
+    if item is None:
+        raise Http404
+    return serialize_cart_item(item)
+
+
+# Read by core.middleware.ReplicaRoutingMiddleware, like the viewsets' flag.
+for view in [product_list, product_detail, category_list, category_detail]:
+    view.use_read_replica = True
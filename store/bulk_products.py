@@ -0,0 +1,225 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from .caching import bump_version
+from .counters import adjust_category_product_counts
+from .models import Category, OrderItem, Product
+from .row_serializers import ProductRowSerializer
+from .search import get_search_backend
+from .signals import bulk_product_delete
+
+# Bulk create, update and delete of products for the catalog sync job. A
+# payload is validated row by row, with the categories and products it
+# refers to looked up once for the whole batch, and is rejected with a list
+# of errors matching its rows, like a ListSerializer's. Rows are written in
+# chunks of STORE_PRODUCT_BULK_BATCH_SIZE, one transaction each, so locks
+# are held only briefly. bulk_create and bulk_update skip the model signals,
+# so the category counters, the search index and the cache version are kept
+# up to date here. Deletes go through the collector for the cascades, with
+# the per-row product handlers switched off (see store.signals).
+
+
+def chunked(values):
+    size = settings.STORE_PRODUCT_BULK_BATCH_SIZE
+    return [values[start:start + size] for start in range(0, len(values), size)]
+
+
+def insert_products(products):
+    Product.objects.bulk_create(products)
+    if connection.vendor == 'mysql':
+        # MySQL doesn't return the ids of bulk inserts. InnoDB gives the rows
+        # of a multi-row insert consecutive ids from LAST_INSERT_ID().
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT LAST_INSERT_ID(), @@auto_increment_increment')
+            first_id, increment = cursor.fetchone()
+        for index, product in enumerate(products):
+            product.id = first_id + index * increment
+
+
+def finish_product_writes(product_ids, category_deltas, reindex):
+    adjust_category_product_counts(category_deltas)
+    backend = get_search_backend()
+    if backend and reindex:
+        backend.index_products(product_ids)
+    transaction.on_commit(lambda: bump_version(Product._meta.label_lower))
+
+
+def serialize_products(products):
+    return ProductRowSerializer().to_representation([
+        {
+            'id': product.id,
+            'name': product.name,
+            'unit_price': product.unit_price,
+            'category__title': product.category.title,
+            'inventory': product.inventory,
+            'description': product.description,
+            'approved_comment_count': product.approved_comment_count,
+        }
+        for product in products
+    ])
+
+
+class BulkProductListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ['Expected a non-empty list of products.']})
+        if len(data) > settings.STORE_PRODUCT_BULK_MAX_ROWS:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                f'Send at most {settings.STORE_PRODUCT_BULK_MAX_ROWS} products at a time.'
+            ]})
+
+        rows, errors = [], []
+        for item in data:
+            try:
+                rows.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                rows.append(None)
+                errors.append(exc.detail)
+        self.check_rows(rows, errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rows
+
+    def check_rows(self, rows, errors):
+        category_ids = {row['category_id'] for row in rows if row and 'category_id' in row}
+        self.categories = Category.objects.in_bulk(category_ids)
+        for row, row_errors in zip(rows, errors):
+            if row and 'category_id' in row and row['category_id'] not in self.categories:
+                row_errors['category'] = [f'There is no category with id {row["category_id"]}.']
+
+    def save(self):
+        products = [Product(**row) for row in self.validated_data]
+        # Product names repeat a lot in catalog feeds.
+        slugs = {name: slugify(name) for name in {product.name for product in products}}
+        for product in products:
+            product.slug = slugs[product.name]
+            product.category = self.categories[product.category_id]
+
+        for chunk in chunked(products):
+            with transaction.atomic():
+                insert_products(chunk)
+                finish_product_writes(
+                    [product.id for product in chunk],
+                    Counter(product.category_id for product in chunk),
+                    reindex=True,
+                )
+        return products
+
+
+class BulkProductUpdateListSerializer(BulkProductListSerializer):
+    def check_rows(self, rows, errors):
+        product_ids = [row['id'] for row in rows if row]
+        self.products = Product.objects.select_related('category').in_bulk(product_ids)
+        seen = set()
+        for row, row_errors in zip(rows, errors):
+            if not row:
+                continue
+            if row['id'] not in self.products:
+                row_errors['id'] = [f'There is no product with id {row["id"]}.']
+            elif row['id'] in seen:
+                row_errors['id'] = [f'Product {row["id"]} is listed more than once.']
+            seen.add(row['id'])
+        super().check_rows(rows, errors)
+
+    def save(self):
+        now = timezone.now()
+        products, fields, moved_from = [], {'datetime_modified'}, {}
+        for row in self.validated_data:
+            product = self.products[row['id']]
+            if row.get('category_id', product.category_id) != product.category_id:
+                moved_from[product.id] = product.category_id
+                product.category = self.categories[row['category_id']]
+            for field, value in row.items():
+                setattr(product, field, value)
+            # bulk_update doesn't run auto_now.
+            product.datetime_modified = now
+            fields.update(field for field in row if field != 'id')
+            products.append(product)
+
+        # The search documents hold the name and the category title.
+        reindex = bool(fields & {'name', 'category_id'})
+        for chunk in chunked(products):
+            category_deltas = Counter()
+            for product in chunk:
+                if product.id in moved_from:
+                    category_deltas[moved_from[product.id]] -= 1
+                    category_deltas[product.category_id] += 1
+            with transaction.atomic():
+                Product.objects.bulk_update(chunk, sorted(fields))
+                finish_product_writes([product.id for product in chunk], category_deltas, reindex)
+        return products
+
+
+class BulkProductSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(max_length=255, source='name')
+    price = serializers.DecimalField(max_digits=6, decimal_places=2, source='unit_price')
+    category = serializers.IntegerField(source='category_id')
+
+    class Meta:
+        model = Product
+        fields = ['title', 'price', 'category', 'inventory', 'description']
+        list_serializer_class = BulkProductListSerializer
+
+
+# Used with partial=True: only id is required, the other fields are changed
+# when present.
+class BulkProductUpdateSerializer(BulkProductSerializer):
+    id = serializers.IntegerField()
+
+    class Meta(BulkProductSerializer.Meta):
+        fields = ['id', *BulkProductSerializer.Meta.fields]
+        list_serializer_class = BulkProductUpdateListSerializer
+
+    def validate(self, attrs):
+        if 'id' not in attrs:
+            raise serializers.ValidationError({'id': [self.fields['id'].error_messages['required']]})
+        return attrs
+
+
+class BulkProductDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.STORE_PRODUCT_BULK_MAX_ROWS,
+    )
+
+    def validate_ids(self, ids):
+        # One query for the whole batch, for both checks.
+        products = dict(
+            Product.objects
+            .filter(id__in=ids)
+            .annotate(has_order_items=Exists(OrderItem.objects.filter(product_id=OuterRef('pk'))))
+            .values_list('id', 'has_order_items')
+        )
+        errors = {}
+        for index, product_id in enumerate(ids):
+            if product_id not in products:
+                errors[index] = [f'There is no product with id {product_id}.']
+            elif products[product_id]:
+                errors[index] = [f'There is some order items including product {product_id}. Please remove them first.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return list(dict.fromkeys(ids))
+
+    def save(self):
+        backend = get_search_backend()
+        for chunk in chunked(self.validated_data['ids']):
+            with transaction.atomic():
+                products = Product.objects.filter(id__in=chunk)
+                category_counts = Counter(products.values_list('category_id', flat=True))
+                token = bulk_product_delete.set(True)
+                try:
+                    products.delete()
+                finally:
+                    bulk_product_delete.reset(token)
+                finish_product_writes(
+                    chunk, {category_id: -count for category_id, count in category_counts.items()}, reindex=False,
+                )
+                if backend:
+                    backend.remove_products(chunk)
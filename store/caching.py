@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.db_routers import read_database
+
+VERSION_KEY = 'store:version:{}'
+RESPONSE_KEY = 'store:response:{}'
+
+
+def new_version():
+    # Versions start from the clock so an evicted stamp never goes backwards.
+    return int(time.time() * 1000)
+
+
+def get_versions(names):
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    versions = cache.get_many(keys.values())
+    for name, key in keys.items():
+        if key not in versions:
+            cache.add(key, new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[keys[name]] for name in names]
+
+
+async def aget_versions(names):
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    versions = await cache.aget_many(keys.values())
+    for name, key in keys.items():
+        if key not in versions:
+            await cache.aadd(key, new_version(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[keys[name]] for name in names]
+
+
+def bump_version(name):
+    key = VERSION_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, new_version(), timeout=None)
+
+
+# Only one caller computes a missing key at a time, the others wait for its
+# result instead of all hitting the database.
+def get_or_compute(key, compute, timeout, lock_timeout=10, poll_interval=0.05):
+    value = cache.get(key)
+    if value is not None:
+        return value, None
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + lock_timeout
+    while not cache.add(lock_key, 1, timeout=lock_timeout):
+        time.sleep(poll_interval)
+        value = cache.get(key)
+        if value is not None:
+            return value, None
+        if time.monotonic() > deadline:
+            break
+
+    try:
+        value, result = compute()
+        if value is not None:
+            cache.set(key, value, timeout)
+        return value, result
+    finally:
+        cache.delete(lock_key)
+
+
+# get_or_compute() for async views, with an async compute().
+async def aget_or_compute(key, compute, timeout, lock_timeout=10, poll_interval=0.05):
+    value = await cache.aget(key)
+    if value is not None:
+        return value, None
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + lock_timeout
+    while not await cache.aadd(lock_key, 1, timeout=lock_timeout):
+        await asyncio.sleep(poll_interval)
+        value = await cache.aget(key)
+        if value is not None:
+            return value, None
+        if time.monotonic() > deadline:
+            break
+
+    try:
+        value, result = await compute()
+        if value is not None:
+            await cache.aset(key, value, timeout)
+        return value, result
+    finally:
+        await cache.adelete(lock_key)
+
+
+class CachedResponseMixin:
+    cache_models = []
+
+    def get_cache_version_names(self):
+        return [model._meta.label_lower for model in self.cache_models]
+
+    def get_response_cache_key(self, request):
+        return self.build_response_cache_key(request, get_versions(self.get_cache_version_names()))
+
+    # For store.async_views, which build the viewset to reuse its queryset.
+    async def aget_response_cache_key(self, request):
+        return self.build_response_cache_key(request, await aget_versions(self.get_cache_version_names()))
+
+    def build_response_cache_key(self, request, versions):
+        raw = repr((
+            type(self).__name__,
+            self.action,
+            sorted(self.kwargs.items()),
+            sorted(request.query_params.lists()),
+            # Pagination links point back to the path the response was built for.
+            request.build_absolute_uri(request.path),
+            # Replicas keep their own entries. A lagging replica may still
+            # return rows from before the write that bumped the version, and
+            # clients pinned to the primary must not be served those.
+            read_database.get(),
+            versions,
+        ))
+        return RESPONSE_KEY.format(hashlib.sha1(raw.encode()).hexdigest())
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        def compute():
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return None, response
+            return response.data, response
+
+        data, response = get_or_compute(self.get_response_cache_key(request), compute, self.get_response_cache_timeout())
+        return response if response is not None else Response(data)
+
+    def get_response_cache_timeout(self):
+        # A replica may still lag behind the write that bumped the version,
+        # so what it returns is only kept for the replication window.
+        timeout = settings.STORE_RESPONSE_CACHE_TIMEOUT
+        if read_database.get() is not None:
+            timeout = min(timeout, settings.STORE_REPLICA_STICKY_SECONDS)
+        return timeout
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
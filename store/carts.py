@@ -0,0 +1,345 @@
+from functools import lru_cache
+from uuid import UUID, uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from .models import Cart, CartItem, Product
+
+
+class CartItemQuantityExceeded(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f'Cart quantity above {CartItem.MAX_QUANTITY} for products {product_ids}')
+
+
+def parse_cart_id(cart_id):
+    try:
+        return cart_id if isinstance(cart_id, UUID) else UUID(str(cart_id))
+    except ValueError:
+        return None
+
+
+def parse_item_id(item_id):
+    try:
+        return int(item_id)
+    except (TypeError, ValueError):
+        return None
+
+
+# Cart stores return Cart and CartItem instances shaped like the ORM ones, so
+# CartSerializer and CartItemSerializer work unchanged on top of any backend.
+class BaseCartStore:
+    def create_cart(self):
+        raise NotImplementedError
+
+    def get_cart(self, cart_id):
+        raise NotImplementedError
+
+    def delete_cart(self, cart_id):
+        raise NotImplementedError
+
+    # get_cart() for checkout, called inside its transaction. Stores with a
+    # cart row lock it, so item writes wait until the order is placed.
+    def lock_cart(self, cart_id):
+        return self.get_cart(cart_id)
+
+    def get_items(self, cart_id):
+        raise NotImplementedError
+
+    def get_item(self, cart_id, item_id):
+        raise NotImplementedError
+
+    def add_item(self, cart_id, product, quantity):
+        return self.add_items(cart_id, {product: quantity})[0]
+
+    def add_items(self, cart_id, quantities):
+        raise NotImplementedError
+
+    def update_item(self, cart_id, item_id, quantity):
+        raise NotImplementedError
+
+    def remove_item(self, cart_id, item_id):
+        raise NotImplementedError
+
+    # Deletes up to batch_size carts with no activity since idle_since and
+    # returns how many carts and items went. Called by reap_carts until it
+    # returns no carts.
+    def delete_idle_carts(self, idle_since, batch_size):
+        raise NotImplementedError
+
+    # Reads for async views. Stores without a native async client run the
+    # sync method in a thread.
+    async def aget_cart(self, cart_id):
+        return await sync_to_async(self.get_cart)(cart_id)
+
+    async def aget_items(self, cart_id):
+        return await sync_to_async(self.get_items)(cart_id)
+
+    async def aget_item(self, cart_id, item_id):
+        cart_id, item_id = parse_cart_id(cart_id), parse_item_id(item_id)
+        if cart_id is None or item_id is None:
+            return None
+        return await sync_to_async(self.get_item)(cart_id, item_id)
+
+
+class ORMCartStore(BaseCartStore):
+    def create_cart(self):
+        return Cart.objects.create()
+
+    def get_cart(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return None
+        return Cart.objects.prefetch_related('items__product').filter(pk=cart_id).first()
+
+    # Item writes update the cart row first (see touch_cart), so they queue
+    # behind this lock, and the items are read after it is taken.
+    def lock_cart(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return None
+        return Cart.objects.select_for_update().prefetch_related('items__product').filter(pk=cart_id).first()
+
+    def delete_cart(self, cart_id):
+        deleted, _ = Cart.objects.filter(pk=cart_id).delete()
+        return deleted > 0
+
+    def get_items(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return []
+        return list(CartItem.objects.select_related('product').filter(cart_id=cart_id))
+
+    def get_item(self, cart_id, item_id):
+        cart_id, item_id = parse_cart_id(cart_id), parse_item_id(item_id)
+        if cart_id is None or item_id is None:
+            return None
+        return CartItem.objects.select_related('product').filter(cart_id=cart_id, pk=item_id).first()
+
+    # Called before an item write. A touched cart is no longer idle, and one
+    # that delete_idle_carts() has locked makes this wait and then find
+    # nothing, so items are never written to a cart being reaped.
+    def touch_cart(self, cart_id):
+        return Cart.objects.filter(pk=cart_id).update(last_activity=timezone.now()) > 0
+
+    def add_items(self, cart_id, quantities):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            raise Cart.DoesNotExist
+        products = {product.id: product for product in quantities}
+        try:
+            with transaction.atomic():
+                if not self.touch_cart(cart_id):
+                    raise Cart.DoesNotExist
+                CartItem.objects.add_quantities(
+                    cart_id,
+                    {product.id: quantity for product, quantity in quantities.items()},
+                )
+                cart_items = list(CartItem.objects.filter(cart_id=cart_id, product_id__in=products).order_by('id'))
+                # SQLite stores totals above the limit, so they are rolled back here.
+                over = [item.product_id for item in cart_items if item.quantity > CartItem.MAX_QUANTITY]
+                if over:
+                    raise CartItemQuantityExceeded(over)
+        except IntegrityError:
+            raise Cart.DoesNotExist
+        except DataError:
+            # MySQL in strict mode and PostgreSQL refuse the total instead.
+            stored = dict(
+                CartItem.objects
+                    .filter(cart_id=cart_id, product_id__in=products)
+                    .values_list('product_id', 'quantity')
+            )
+            raise CartItemQuantityExceeded([
+                product.id for product, quantity in quantities.items()
+                if stored.get(product.id, 0) + quantity > CartItem.MAX_QUANTITY
+            ])
+        for cart_item in cart_items:
+            cart_item.product = products[cart_item.product_id]
+        return cart_items
+
+    def update_item(self, cart_id, item_id, quantity):
+        self.touch_cart(cart_id)
+        CartItem.objects.filter(cart_id=cart_id, pk=item_id).update(quantity=quantity)
+        return self.get_item(cart_id, item_id)
+
+    def remove_item(self, cart_id, item_id):
+        self.touch_cart(cart_id)
+        deleted, _ = CartItem.objects.filter(cart_id=cart_id, pk=item_id).delete()
+        return deleted > 0
+
+    def delete_idle_carts(self, idle_since, batch_size):
+        # One short transaction per batch. Carts locked by an item write are
+        # skipped and looked at again on the next run.
+        with transaction.atomic():
+            cart_ids = list(
+                Cart.objects
+                    .filter(last_activity__lt=idle_since)
+                    .order_by('last_activity')
+                    .select_for_update(skip_locked=True)
+                    .values_list('id', flat=True)[:batch_size]
+            )
+            if not cart_ids:
+                return 0, 0
+            _, deleted = Cart.objects.filter(id__in=cart_ids).delete()
+        return deleted.get(Cart._meta.label, 0), deleted.get(CartItem._meta.label, 0)
+
+    async def aget_cart(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return None
+        cart = await Cart.objects.filter(pk=cart_id).afirst()
+        if cart is not None:
+            attach_items(cart, await self.aget_items(cart_id))
+        return cart
+
+    async def aget_items(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return []
+        return [item async for item in CartItem.objects.select_related('product').filter(cart_id=cart_id)]
+
+    async def aget_item(self, cart_id, item_id):
+        cart_id, item_id = parse_cart_id(cart_id), parse_item_id(item_id)
+        if cart_id is None or item_id is None:
+            return None
+        return await CartItem.objects.select_related('product').filter(cart_id=cart_id, pk=item_id).afirst()
+
+
+# Keeps each cart in one Redis hash: 'created_at' plus a 'product:<id>'
+# field holding the quantity. Item ids are the product ids. Every write
+# resets the key's expiry to STORE_CART_TTL, so Redis drops idle carts itself.
+class RedisCartStore(BaseCartStore):
+    key_prefix = 'store:cart:'
+    item_prefix = 'product:'
+
+    def __init__(self, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImproperlyConfigured('RedisCartStore requires the "redis" package.')
+            client = redis.Redis.from_url(settings.STORE_CART_REDIS_URL)
+        self.client = client
+
+    def key(self, cart_id):
+        return f'{self.key_prefix}{cart_id}'
+
+    def field(self, product_id):
+        return f'{self.item_prefix}{product_id}'
+
+    def build_cart(self, cart_id, values):
+        created_at = values.pop(b'created_at', None)
+        cart = Cart(id=cart_id, created_at=parse_datetime(created_at.decode()) if created_at else None)
+        quantities = {
+            int(field.decode()[len(self.item_prefix):]): int(quantity)
+            for field, quantity in values.items()
+        }
+        products = Product.objects.in_bulk(quantities.keys())
+        items = []
+        for product_id, quantity in sorted(quantities.items()):
+            if product_id in products:
+                item = CartItem(id=product_id, cart=cart, product=products[product_id], quantity=quantity)
+                items.append(item)
+        attach_items(cart, items)
+        return cart
+
+    def create_cart(self):
+        cart = Cart(id=uuid4(), created_at=timezone.now())
+        pipeline = self.client.pipeline()
+        pipeline.hset(self.key(cart.id), 'created_at', cart.created_at.isoformat())
+        pipeline.expire(self.key(cart.id), settings.STORE_CART_TTL)
+        pipeline.execute()
+        attach_items(cart, [])
+        return cart
+
+    def get_cart(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return None
+        values = self.client.hgetall(self.key(cart_id))
+        if not values:
+            return None
+        return self.build_cart(cart_id, values)
+
+    def delete_cart(self, cart_id):
+        return self.client.delete(self.key(cart_id)) > 0
+
+    def get_items(self, cart_id):
+        cart = self.get_cart(cart_id)
+        return list(cart.items.all()) if cart else []
+
+    def get_item(self, cart_id, item_id):
+        product_id = parse_item_id(item_id)
+        if product_id is None:
+            return None
+        quantity = self.client.hget(self.key(cart_id), self.field(product_id))
+        product = Product.objects.filter(pk=product_id).first()
+        if quantity is None or product is None:
+            return None
+        return CartItem(id=product_id, cart_id=cart_id, product=product, quantity=int(quantity))
+
+    def add_items(self, cart_id, quantities):
+        key = self.key(cart_id)
+        fields = [self.field(product.id) for product in quantities]
+
+        # Runs again if the cart changes between the check and the increments.
+        def add(pipeline):
+            if not pipeline.exists(key):
+                raise Cart.DoesNotExist
+            stored = pipeline.hmget(key, fields)
+            over = [
+                product.id for (product, quantity), value in zip(quantities.items(), stored)
+                if int(value or 0) + quantity > CartItem.MAX_QUANTITY
+            ]
+            if over:
+                raise CartItemQuantityExceeded(over)
+            pipeline.multi()
+            for field, quantity in zip(fields, quantities.values()):
+                pipeline.hincrby(key, field, quantity)
+            pipeline.expire(key, settings.STORE_CART_TTL)
+
+        totals = self.client.transaction(add, key)[:-1]
+        return [
+            CartItem(id=product.id, cart_id=cart_id, product=product, quantity=quantity)
+            for product, quantity in zip(quantities, totals)
+        ]
+
+    def update_item(self, cart_id, item_id, quantity):
+        key, field = self.key(cart_id), self.field(item_id)
+        if self.client.hexists(key, field):
+            pipeline = self.client.pipeline()
+            pipeline.hset(key, field, quantity)
+            pipeline.expire(key, settings.STORE_CART_TTL)
+            pipeline.execute()
+        return self.get_item(cart_id, item_id)
+
+    def remove_item(self, cart_id, item_id):
+        key = self.key(cart_id)
+        pipeline = self.client.pipeline()
+        pipeline.hdel(key, self.field(item_id))
+        pipeline.expire(key, settings.STORE_CART_TTL)
+        return pipeline.execute()[0] > 0
+
+    def delete_idle_carts(self, idle_since, batch_size):
+        # Expired by Redis.
+        return 0, 0
+
+
+def attach_items(cart, items):
+    # Fill the prefetch cache the way prefetch_related() does, so
+    # cart.items.all() returns these items without touching the database.
+    queryset = cart.items.all()
+    queryset._result_cache = items
+    queryset._prefetch_done = True
+    cart._prefetched_objects_cache = {'items': queryset}
+
+
+@lru_cache
+def get_cart_store():
+    return import_string(settings.STORE_CART_BACKEND)()
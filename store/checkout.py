@@ -0,0 +1,67 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+
+from .caching import bump_version
+from .models import Order, OrderItem, Product
+
+
+class InsufficientInventory(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f'Not enough inventory for products {product_ids}')
+
+
+def place_order(customer_id, cart_items):
+    quantities = {}
+    for cart_item in cart_items:
+        quantities[cart_item.product_id] = quantities.get(cart_item.product_id, 0) + cart_item.quantity
+    product_ids = sorted(quantities)
+
+    with transaction.atomic():
+        # Lock only the ordered products, always in id order so concurrent
+        # checkouts sharing products cannot deadlock each other.
+        products = {
+            product['id']: product
+            for product in Product.objects
+                .select_for_update()
+                .filter(id__in=product_ids)
+                .order_by('id')
+                .values('id', 'unit_price', 'inventory')
+        }
+        short = [
+            product_id for product_id in product_ids
+            if product_id not in products or products[product_id]['inventory'] < quantities[product_id]
+        ]
+        if short:
+            raise InsufficientInventory(short)
+
+        updated = Product.objects \
+            .filter(reduce(or_, [Q(id=product_id, inventory__gte=quantity) for product_id, quantity in quantities.items()])) \
+            .update(inventory=Case(
+                *[When(id=product_id, then=F('inventory') - quantity) for product_id, quantity in quantities.items()],
+                output_field=IntegerField(),
+            ))
+        if updated != len(product_ids):
+            raise InsufficientInventory(product_ids)
+
+        order_items = [
+            OrderItem(
+                product_id=product_id,
+                unit_price=products[product_id]['unit_price'],
+                quantity=quantities[product_id],
+            ) for product_id in product_ids
+        ]
+        order = Order.objects.create(
+            customer_id=customer_id,
+            total_price=sum(item.quantity * item.unit_price for item in order_items),
+            item_count=len(order_items),
+        )
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+        transaction.on_commit(lambda: bump_version(Product._meta.label_lower))
+        return order
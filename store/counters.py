@@ -0,0 +1,67 @@
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now
+
+from .models import Category, Comment, Order, OrderItem, Product
+
+# Comment statuses with a counter on Product. Rejected comments are not counted.
+COMMENT_COUNT_FIELDS = {
+    Comment.COMMENT_STATUS_APPROVED: 'approved_comment_count',
+    Comment.COMMENT_STATUS_WAITING: 'pending_comment_count',
+}
+
+
+def adjust_category_product_counts(deltas):
+    for category_id, delta in deltas.items():
+        if category_id is None or not delta:
+            continue
+        categories = Category.objects.filter(pk=category_id)
+        if delta < 0:
+            categories = categories.filter(product_count__gte=-delta)
+        categories.update(product_count=F('product_count') + delta)
+
+
+def rebuild_category_product_counts():
+    product_counts = Product.objects \
+        .filter(category_id=OuterRef('pk')) \
+        .order_by() \
+        .values('category_id') \
+        .annotate(count=Count('id')) \
+        .values('count')
+    return Category.objects.update(product_count=Coalesce(Subquery(product_counts), Value(0)))
+
+
+def adjust_product_comment_counts(product_id, deltas):
+    for status, delta in deltas.items():
+        field = COMMENT_COUNT_FIELDS.get(status)
+        if product_id is None or field is None or not delta:
+            continue
+        products = Product.objects.filter(pk=product_id)
+        if delta < 0:
+            products = products.filter(**{f'{field}__gte': -delta})
+        products.update(**{field: F(field) + delta})
+
+
+def rebuild_product_comment_counts():
+    def comment_counts(status):
+        return Comment.objects \
+            .filter(product_id=OuterRef('pk'), status=status) \
+            .order_by() \
+            .values('product_id') \
+            .annotate(count=Count('id')) \
+            .values('count')
+
+    return Product.objects.update(**{
+        field: Coalesce(Subquery(comment_counts(status)), Value(0))
+        for status, field in COMMENT_COUNT_FIELDS.items()
+    })
+
+
+def refresh_order_totals(orders):
+    items = OrderItem.objects.filter(order_id=OuterRef('pk')).order_by().values('order_id')
+    total_price = items.annotate(total=Sum(F('quantity') * F('unit_price'))).values('total')
+    item_count = items.annotate(count=Count('id')).values('count')
+    return orders.update(
+        total_price=Coalesce(Subquery(total_price), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        item_count=Coalesce(Subquery(item_count), Value(0)),
+        datetime_modified=Now(),
+    )
@@ -0,0 +1,124 @@
+import csv
+import datetime
+
+import orjson
+from django.utils import timezone
+from rest_framework import serializers
+
+from core.renderers import default
+from .models import Order, OrderItem
+
+# Streams orders with their items as NDJSON (one order per line) or CSV (one
+# order item per line). Orders are read in keyset batches of chunk_size
+# rather than with .iterator(), since mysqlclient buffers the whole result of
+# a query in memory, so memory stays flat however many orders are exported.
+
+ORDER_FIELDS = [
+    'id', 'customer_id', 'customer__user__first_name', 'customer__user__last_name',
+    'customer__user__email', 'status', 'datetime_created', 'total_price', 'item_count',
+]
+ITEM_FIELDS = ['order_id', 'product_id', 'product__name', 'quantity', 'unit_price']
+CSV_HEADER = [
+    'order_id', 'customer_id', 'first_name', 'last_name', 'email', 'status', 'datetime_created',
+    'total_price', 'item_count', 'product_id', 'product_name', 'quantity', 'unit_price',
+]
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class OrderExportFilterSerializer(serializers.Serializer):
+    # Not "format", which DRF reserves for picking a renderer.
+    file_format = serializers.ChoiceField(choices=list(CONTENT_TYPES), default='ndjson')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    status = serializers.MultipleChoiceField(choices=Order.ORDER_STATUS, required=False)
+    chunk_size = serializers.IntegerField(min_value=1, max_value=10000, default=1000)
+
+
+def start_of_day(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def get_export_queryset(date_from=None, date_to=None, status=None):
+    # Ranges on the column itself, so an index on datetime_created applies.
+    queryset = Order.objects.all()
+    if date_from:
+        queryset = queryset.filter(datetime_created__gte=start_of_day(date_from))
+    if date_to:
+        queryset = queryset.filter(datetime_created__lt=start_of_day(date_to + datetime.timedelta(days=1)))
+    if status:
+        queryset = queryset.filter(status__in=status)
+    return queryset
+
+
+def iter_orders(queryset, chunk_size):
+    last_id = 0
+    while True:
+        orders = list(queryset.filter(id__gt=last_id).order_by('id').values(*ORDER_FIELDS)[:chunk_size])
+        if not orders:
+            return
+        items = {order['id']: [] for order in orders}
+        for item in OrderItem.objects.filter(order_id__in=items).order_by('order_id', 'id').values(*ITEM_FIELDS):
+            items[item['order_id']].append(item)
+        for order in orders:
+            yield order, items[order['id']]
+        last_id = orders[-1]['id']
+
+
+def ndjson_lines(queryset, chunk_size):
+    for order, items in iter_orders(queryset, chunk_size):
+        yield orjson.dumps({
+            'id': order['id'],
+            'customer': {
+                'id': order['customer_id'],
+                'first_name': order['customer__user__first_name'],
+                'last_name': order['customer__user__last_name'],
+                'email': order['customer__user__email'],
+            },
+            'status': order['status'],
+            'datetime_created': order['datetime_created'],
+            'total_price': order['total_price'],
+            'item_count': order['item_count'],
+            'items': [
+                {
+                    'product_id': item['product_id'],
+                    'product_name': item['product__name'],
+                    'quantity': item['quantity'],
+                    'unit_price': item['unit_price'],
+                }
+                for item in items
+            ],
+        }, default=default, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE)
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(queryset, chunk_size):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER).encode()
+    for order, items in iter_orders(queryset, chunk_size):
+        order_columns = [
+            order['id'], order['customer_id'], order['customer__user__first_name'],
+            order['customer__user__last_name'], order['customer__user__email'], order['status'],
+            order['datetime_created'].isoformat(), order['total_price'], order['item_count'],
+        ]
+        # Orders without items still get a line.
+        for item in items or [dict.fromkeys(ITEM_FIELDS, '')]:
+            yield writer.writerow(order_columns + [
+                item['product_id'], item['product__name'], item['quantity'], item['unit_price'],
+            ]).encode()
+
+
+EXPORT_WRITERS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
+
+
+def export_orders(queryset, file_format, chunk_size):
+    return EXPORT_WRITERS[file_format](queryset, chunk_size)
@@ -0,0 +1,157 @@
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from faker import Faker
+
+# Row generators for setup_fake_data. They run in worker processes, so they
+# only build plain dicts of field values and never touch Django or the database.
+
+FAKE_USERNAME_PREFIX = 'fake_user_'
+
+
+def price_for(product_id):
+    # Derived from the id so order and cart items can be priced without
+    # looking the product up.
+    return Decimal(random.Random(product_id).randint(100, 100000)).scaleb(-2)
+
+
+def random_datetime(rng):
+    return datetime(rng.randrange(2019, 2023), rng.randint(1, 12), rng.randint(1, 28), tzinfo=timezone.utc)
+
+
+def make_faker(seed):
+    faker = Faker()
+    faker.seed_instance(seed)
+    return faker
+
+
+def category_rows(start, count, seed):
+    faker = make_faker(seed)
+    return {'category': [
+        {
+            'id': category_id,
+            'title': faker.sentence(nb_words=5, variable_nb_words=True),
+            'description': faker.paragraph(nb_sentences=1, variable_nb_sentences=False),
+        }
+        for category_id in range(start, start + count)
+    ]}
+
+
+def discount_rows(start, count, seed):
+    faker = make_faker(seed)
+    rng = random.Random(seed)
+    return {'discount': [
+        {
+            'id': discount_id,
+            'discount': rng.randint(1, 80) / 100,
+            'description': faker.paragraph(nb_sentences=1, variable_nb_sentences=False),
+        }
+        for discount_id in range(start, start + count)
+    ]}
+
+
+def product_rows(start, count, seed, num_categories, comment_statuses, approved_status, pending_status):
+    faker = make_faker(seed)
+    rng = random.Random(seed)
+    products, comments = [], []
+    for product_id in range(start, start + count):
+        name = ' '.join(word.capitalize() for word in faker.words(3))
+        datetime_created = random_datetime(rng)
+        statuses = [rng.choice(comment_statuses) for _ in range(rng.randint(1, 5))]
+        products.append({
+            'id': product_id,
+            'name': name,
+            'slug': '-'.join(name.split(' ')).lower(),
+            'description': faker.paragraph(nb_sentences=5, variable_nb_sentences=True),
+            'unit_price': price_for(product_id),
+            'inventory': rng.randint(1, 100),
+            'category_id': rng.randint(1, num_categories),
+            'datetime_created': datetime_created,
+            'datetime_modified': datetime_created + timedelta(hours=rng.randint(1, 500)),
+            'approved_comment_count': statuses.count(approved_status),
+            'pending_comment_count': statuses.count(pending_status),
+        })
+        for status in statuses:
+            comments.append({
+                'product_id': product_id,
+                'name': faker.first_name(),
+                'body': faker.paragraph(nb_sentences=3, variable_nb_sentences=True),
+                'status': status,
+                'datetime_created': random_datetime(rng),
+            })
+    return {'product': products, 'comment': comments}
+
+
+def customer_rows(start, count, seed, first_user_id, unusable_password):
+    faker = make_faker(seed)
+    rng = random.Random(seed)
+    users, customers, addresses = [], [], []
+    for customer_id in range(start, start + count):
+        user_id = first_user_id + customer_id - 1
+        username = f'{FAKE_USERNAME_PREFIX}{customer_id}'
+        email = f'{username}@example.com'
+        users.append({
+            'id': user_id,
+            'username': username,
+            'email': email,
+            'first_name': faker.first_name(),
+            'last_name': faker.last_name(),
+            'password': unusable_password,
+            'date_joined': random_datetime(rng),
+        })
+        customers.append({
+            'id': customer_id,
+            'user_id': user_id,
+            'email': email,
+            'phone_number': faker.phone_number(),
+            'birth_date': faker.date_between(datetime(1990, 1, 1), datetime(2015, 1, 1)) if rng.random() > 0.3 else None,
+        })
+        addresses.append({
+            'customer_id': customer_id,
+            'province': faker.word(),
+            'city': faker.word(),
+            'street': f'street {rng.randint(1, 50)}',
+        })
+    return {'user': users, 'customer': customers, 'address': addresses}
+
+
+def order_rows(start, count, seed, num_customers, num_products, order_statuses):
+    rng = random.Random(seed)
+    orders, order_items = [], []
+    for order_id in range(start, start + count):
+        items = [
+            {
+                'order_id': order_id,
+                'product_id': product_id,
+                'quantity': rng.randint(1, 20),
+                'unit_price': price_for(product_id),
+            }
+            for product_id in rng.sample(range(1, num_products + 1), min(rng.randint(1, 10), num_products))
+        ]
+        orders.append({
+            'id': order_id,
+            'customer_id': rng.randint(1, num_customers),
+            'status': rng.choice(order_statuses),
+            'datetime_created': random_datetime(rng),
+            'total_price': sum(item['quantity'] * item['unit_price'] for item in items),
+            'item_count': len(items),
+        })
+        order_items.extend(items)
+    return {'order': orders, 'orderitem': order_items}
+
+
+def cart_rows(start, count, seed, num_products):
+    rng = random.Random(seed)
+    carts, cart_items = [], []
+    for _ in range(count):
+        cart_id = UUID(int=rng.getrandbits(128), version=4)
+        carts.append({'id': cart_id})
+        for product_id in rng.sample(range(1, num_products + 1), min(rng.randint(1, 10), num_products)):
+            cart_items.append({
+                'cart_id': cart_id,
+                'product_id': product_id,
+                'quantity': rng.randint(1, 20),
+            })
+    return {'cart': carts, 'cartitem': cart_items}
@@ -1,10 +1,26 @@
 from django_filters.rest_framework import FilterSet
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
 
 from .models import Product
+from .search import get_search_backend
 
 class ProductFilter(FilterSet):
     class Meta:
         model = Product
         fields = {
             'inventory': ['gt', 'lt', ],
-        }
\ No newline at end of file
+        }
+
+
+class ProductSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        backend = get_search_backend(queryset.db)
+        if not search_terms or backend is None:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = backend.search(queryset, ' '.join(search_terms))
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-search_rank')
+        return queryset
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.counters import refresh_order_totals
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = "Fills Order.total_price and Order.item_count from the order items, in chunks of orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--start-id', type=int, default=0, help='Resume after this order id')
+
+    def handle(self, *args, **options):
+        last_id = options['start_id']
+        updated = 0
+        start = time.perf_counter()
+        while True:
+            order_ids = list(
+                Order.objects
+                    .filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', flat=True)[:options['chunk_size']]
+            )
+            if not order_ids:
+                break
+            # One short transaction per chunk keeps row locks brief.
+            with transaction.atomic():
+                updated += refresh_order_totals(Order.objects.filter(id__in=order_ids))
+            last_id = order_ids[-1]
+            self.stdout.write(f"Updated {updated} orders, up to id {last_id}.")
+        self.stdout.write(f"Backfilled {updated} orders in {time.perf_counter() - start:.1f}s.")
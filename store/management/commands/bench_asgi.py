@@ -0,0 +1,204 @@
+import asyncio
+import io
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from store.carts import get_cart_store
+from store.models import Product
+
+# Each endpoint is served by one in-process worker of either kind, driven by
+# a growing number of concurrent clients: the sync viewset by a WSGI worker
+# with --threads threads, the async view by an ASGI worker on one event loop.
+# --db-latency adds a sleep to every query, standing in for the round trip
+# to a database server, which is where async workers stop holding a thread.
+ENDPOINTS = [
+    # name, WSGI path, ASGI path
+    ('product-list', '/store/products/', '/store/async/products/'),
+    ('product-detail', '/store/products/{product}/', '/store/async/products/{product}/'),
+    ('category-list', '/store/categories/', '/store/async/categories/'),
+    ('cart-detail', '/store/carts/{cart}/', '/store/async/carts/{cart}/'),
+    ('cart-item-list', '/store/carts/{cart}/items/', '/store/async/carts/{cart}/items/'),
+]
+
+
+def wsgi_get(application, path):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'SERVER_NAME': 'localhost',
+        'HTTP_HOST': 'localhost',
+        # A non-internal address keeps the debug toolbar out of the measurements.
+        'REMOTE_ADDR': '203.0.113.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+    setup_testing_defaults(environ)
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_get(application, path):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('203.0.113.1', 50000),
+        'server': ('localhost', 80),
+    }
+    body_sent = False
+    statuses = []
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected until the response is sent.
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+class Command(BaseCommand):
+    help = "Load tests the sync catalog and cart endpoints on a WSGI worker against their async versions on an ASGI worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,10,50,200', help='Comma separated numbers of concurrent clients')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint and concurrency level')
+        parser.add_argument('--threads', type=int, default=4, help='Threads of the WSGI worker')
+        parser.add_argument('--db-latency', type=float, default=5, help='Milliseconds added to every query')
+        parser.add_argument('--only', nargs='+', help='Endpoint names to run')
+        parser.add_argument('--output', default='bench_asgi.json')
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['only'] or endpoint[0] in options['only']
+        ]
+        product = Product.objects.order_by('id').first()
+        if product is None:
+            raise CommandError("No products, run setup_fake_data first.")
+
+        # Workers run in other threads, so the cart has to be committed.
+        store = get_cart_store()
+        cart = store.create_cart()
+        store.add_items(cart.id, {
+            product: 1 for product in Product.objects.order_by('id')[:3]
+        })
+        ids = {'product': product.id, 'cart': cart.id}
+
+        self.latency = options['db_latency'] / 1000
+        connection_created.connect(self.add_latency)
+        for connection in connections.all(initialized_only=True):
+            self.add_latency(None, connection)
+
+        wsgi_application = get_wsgi_application()
+        asgi_application = get_asgi_application()
+        results = []
+        try:
+            for name, wsgi_path, asgi_path in endpoints:
+                for concurrency in levels:
+                    for server, result in [
+                        ('wsgi', self.run_wsgi(wsgi_application, wsgi_path.format(**ids), concurrency, options)),
+                        ('asgi', asyncio.run(self.run_asgi(asgi_application, asgi_path.format(**ids), concurrency, options))),
+                    ]:
+                        results.append({'name': name, 'server': server, 'concurrency': concurrency, **result})
+                        self.stdout.write(
+                            f"{name:<16} {server} c={concurrency:<4} {result['requests_per_second']:>8.1f} req/s "
+                            f"p50 {result['p50_ms']:>8.2f} p95 {result['p95_ms']:>8.2f} p99 {result['p99_ms']:>8.2f} ms"
+                            + (f"  {result['errors']} errors" if result['errors'] else '')
+                        )
+        finally:
+            connection_created.disconnect(self.add_latency)
+            store.delete_cart(cart.id)
+
+        report = {
+            'wsgi_threads': options['threads'],
+            'db_latency_ms': options['db_latency'],
+            'requests': options['requests'],
+            'results': results,
+        }
+        with open(options['output'], 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+            output_file.write('\n')
+        self.stdout.write(f"Wrote {options['output']}")
+
+    # Threads reconnect on every request, so the wrapper is only added once.
+    def add_latency(self, sender, connection, **kwargs):
+        if self.latency and self.sleep_on_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self.sleep_on_query)
+
+    def sleep_on_query(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def run_wsgi(self, application, path, concurrency, options):
+        # Clients queue for the worker's threads like connections queue for
+        # a gthread worker.
+        timings, statuses = [], []
+
+        def client(count):
+            for _ in range(count):
+                start = time.perf_counter()
+                statuses.append(worker.submit(wsgi_get, application, path).result())
+                timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as worker, ThreadPoolExecutor(concurrency) as clients:
+            list(clients.map(client, self.split(options['requests'], concurrency)))
+        return self.summarize(timings, statuses, time.perf_counter() - start)
+
+    async def run_asgi(self, application, path, concurrency, options):
+        timings, statuses = [], []
+
+        async def client(count):
+            for _ in range(count):
+                start = time.perf_counter()
+                statuses.append(await asgi_get(application, path))
+                timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[client(count) for count in self.split(options['requests'], concurrency)])
+        return self.summarize(timings, statuses, time.perf_counter() - start)
+
+    def split(self, requests, clients):
+        return [requests // clients + (index < requests % clients) for index in range(clients)]
+
+    def summarize(self, timings, statuses, elapsed):
+        timings = [timing * 1000 for timing in timings]
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+        return {
+            'requests_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'errors': sum(status != 200 for status in statuses),
+        }
@@ -0,0 +1,42 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Compares cart store throughput for a create / add items / read / delete cart workload"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends',
+            nargs='+',
+            default=['store.carts.ORMCartStore', 'store.carts.RedisCartStore'],
+        )
+        parser.add_argument('--carts', type=int, default=200)
+        parser.add_argument('--items-per-cart', type=int, default=5)
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.order_by('?')[:100])
+        if len(products) < options['items_per_cart']:
+            raise CommandError("Not enough products, run setup_fake_data first.")
+
+        self.stdout.write(f"{'backend':<32} {'carts/s':>10} {'ops/s':>10}")
+        for backend_path in options['backends']:
+            store = import_string(backend_path)()
+            operations = 0
+            start = time.perf_counter()
+            for _ in range(options['carts']):
+                cart = store.create_cart()
+                for product in random.sample(products, options['items_per_cart']):
+                    store.add_item(cart.id, product, random.randint(1, 5))
+                store.get_cart(cart.id)
+                store.delete_cart(cart.id)
+                operations += options['items_per_cart'] + 3
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{backend_path:<32} {options['carts'] / elapsed:>10.1f} {operations / elapsed:>10.1f}"
+            )
@@ -0,0 +1,86 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+from rest_framework.exceptions import ValidationError
+
+from store.carts import get_cart_store
+from store.models import Category, Customer, OrderItem, Product
+from store.serializers import OrderCreateSerializer
+
+
+class Command(BaseCommand):
+    help = "Runs concurrent checkouts against scarce inventory (use MySQL, SQLite serializes writers), checks nothing is oversold and reports orders/s"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carts', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--products', type=int, default=20)
+        parser.add_argument('--inventory', type=int, default=100)
+        parser.add_argument('--items-per-cart', type=int, default=3)
+
+    def handle(self, *args, **options):
+        store = get_cart_store()
+        category = Category.objects.create(title='Checkout benchmark')
+        products = [
+            Product.objects.create(
+                name=f'Checkout benchmark product {number}',
+                slug=f'checkout-benchmark-product-{number}',
+                description='',
+                category=category,
+                unit_price=random.randint(100, 10000) / 100,
+                inventory=options['inventory'],
+            )
+            for number in range(options['products'])
+        ]
+        user, _ = get_user_model().objects.get_or_create(username='checkout_benchmark', defaults={'email': 'checkout_benchmark@example.com'})
+        customer, _ = Customer.objects.get_or_create(user=user)
+
+        cart_ids = []
+        for _ in range(options['carts']):
+            cart = store.create_cart()
+            store.add_items(cart.id, {
+                product: random.randint(1, 5)
+                for product in random.sample(products, options['items_per_cart'])
+            })
+            cart_ids.append(cart.id)
+
+        def checkout(cart_id):
+            try:
+                serializer = OrderCreateSerializer(data={'cart_id': cart_id}, context={'customer_id': customer.id})
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                return True
+            except ValidationError:
+                return False
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = list(executor.map(checkout, cart_ids))
+        elapsed = time.perf_counter() - start
+
+        placed = sum(results)
+        ordered = dict(
+            OrderItem.objects
+                .filter(product__category=category)
+                .values_list('product_id')
+                .annotate(quantity=Sum('quantity'))
+        )
+        oversold = []
+        for product in Product.objects.filter(category=category):
+            if product.inventory < 0 or ordered.get(product.id, 0) + product.inventory != options['inventory']:
+                oversold.append(product.id)
+
+        self.stdout.write(
+            f"{placed} orders placed, {len(results) - placed} rejected in {elapsed:.2f}s "
+            f"({placed / elapsed:.1f} orders/s, {options['workers']} workers)"
+        )
+        if oversold:
+            raise CommandError(f"Inventory is inconsistent for products {oversold}")
+        self.stdout.write("No product was oversold.")
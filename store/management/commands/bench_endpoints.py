@@ -0,0 +1,275 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from core.authentication import CustomerTokenObtainPairSerializer, get_cached_user
+
+from store.carts import get_cart_store
+from store.models import Category, Comment, Customer, Order, Product
+
+# Every route in store/urls.py. The query budgets are per request with a cold
+# response cache and do not depend on the size of the dataset, so an N+1
+# query shows up as soon as a list endpoint returns more than one row. They
+# include the SAVEPOINT statements of atomic blocks, since every request runs
+# inside the benchmark's transaction.
+ENDPOINTS = [
+    # name, user, method, path, data, expected status, query budget
+    ('product-list', None, 'get', '/store/products/', None, 200, 2),
+    ('product-list-cursor', None, 'get', '/store/products/?pagination=cursor', None, 200, 1),
+    ('product-search', None, 'get', '/store/products/?search={search}', None, 200, 2),
+    ('product-detail', None, 'get', '/store/products/{product}/', None, 200, 1),
+    ('product-update', 'admin', 'patch', '/store/products/{product}/', lambda ids: {'inventory': 50}, 200, 4),
+    ('product-delete', 'admin', 'delete', '/store/products/{new_product}/', None, 204, 11),
+    ('product-bulk-create', 'admin', 'post', '/store/products/bulk/', lambda ids: [
+        {'title': f'Bulk product {index}', 'price': '9.99', 'category': ids['category'], 'inventory': 10, 'description': 'Benchmark'}
+        for index in range(50)
+    ], 201, 7),
+    ('product-bulk-update', 'admin', 'patch', '/store/products/bulk/', lambda ids: [
+        {'id': product_id, 'inventory': 40} for product_id in ids['products']
+    ], 200, 4),
+    ('product-bulk-delete', 'admin', 'delete', '/store/products/bulk/', lambda ids: {'ids': [ids['new_product']]}, 204, 14),
+    ('comment-list', None, 'get', '/store/products/{product}/comments/', None, 200, 1),
+    ('comment-detail', None, 'get', '/store/products/{comment_product}/comments/{comment}/', None, 200, 1),
+    ('comment-create', None, 'post', '/store/products/{product}/comments/', lambda ids: {
+        'name': 'Benchmark', 'body': 'benchmark comment', 'status': Comment.COMMENT_STATUS_WAITING,
+    }, 201, 2),
+    ('category-list', None, 'get', '/store/categories/', None, 200, 1),
+    ('category-detail', None, 'get', '/store/categories/{category}/', None, 200, 1),
+    ('category-create', 'admin', 'post', '/store/categories/', lambda ids: {
+        'title': 'Benchmark category', 'description': 'benchmark',
+    }, 201, 1),
+    ('category-delete', 'admin', 'delete', '/store/categories/{new_category}/', None, 204, 5),
+    ('cart-create', None, 'post', '/store/carts/', None, 201, 3),
+    ('cart-detail', None, 'get', '/store/carts/{cart}/', None, 200, 3),
+    ('cart-delete', None, 'delete', '/store/carts/{cart}/', None, 204, 6),
+    ('cart-item-list', None, 'get', '/store/carts/{cart}/items/', None, 200, 1),
+    ('cart-item-detail', None, 'get', '/store/carts/{cart}/items/{cart_item}/', None, 200, 1),
+    ('cart-item-create', None, 'post', '/store/carts/{cart}/items/', lambda ids: {
+        'product': ids['product'], 'quantity': 1,
+    }, 201, 6),
+    ('cart-item-bulk', None, 'post', '/store/carts/{cart}/items/bulk/', lambda ids: [
+        {'product': product_id, 'quantity': 1} for product_id in ids['products']
+    ], 201, 6),
+    ('cart-item-update', None, 'patch', '/store/carts/{cart}/items/{cart_item}/', lambda ids: {'quantity': 2}, 200, 4),
+    ('cart-item-delete', None, 'delete', '/store/carts/{cart}/items/{cart_item}/', None, 204, 3),
+    ('customer-list', 'admin', 'get', '/store/customers/', None, 200, 1),
+    ('customer-detail', 'admin', 'get', '/store/customers/{customer}/', None, 200, 1),
+    ('customer-me', 'customer', 'get', '/store/customers/me/', None, 200, 1),
+    ('customer-me-update', 'customer', 'put', '/store/customers/me/', lambda ids: {'birth_date': '2000-01-01'}, 200, 2),
+    ('customer-send-private-email', 'admin', 'get', '/store/customers/{customer}/send_private_email/', None, 200, 0),
+    ('customer-send-private-email-staff', 'staff', 'get', '/store/customers/{customer}/send_private_email/', None, 200, 0),
+    ('order-list', 'customer', 'get', '/store/orders/', None, 200, 2),
+    ('order-list-admin', 'admin', 'get', '/store/orders/', None, 200, 2),
+    ('order-detail', 'customer', 'get', '/store/orders/{order}/', None, 200, 2),
+    ('order-create', 'customer', 'post', '/store/orders/', lambda ids: {'cart_id': ids['cart']}, 200, 19),
+    ('order-update', 'admin', 'patch', '/store/orders/{order}/', lambda ids: {'status': Order.ORDER_STATUS_PAID}, 200, 3),
+    ('analytics-by-day', 'admin', 'get', '/store/analytics/', None, 200, 2),
+    ('analytics-by-product', 'admin', 'get', '/store/analytics/?group_by=product', None, 200, 2),
+]
+
+
+class Command(BaseCommand):
+    help = "Hits every store route and writes latency percentiles, query counts and memory per endpoint to a JSON file, failing when a budget is exceeded"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, help='Run setup_fake_data with this scale first')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--latency-budget', type=float, default=250, help='Default p95 budget in ms')
+        parser.add_argument('--budgets', help='JSON file of {endpoint: {"queries": n, "p95_ms": ms}} overrides')
+        parser.add_argument('--only', nargs='+', help='Endpoint names to run')
+        parser.add_argument('--output', default='bench_endpoints.json')
+
+    def handle(self, *args, **options):
+        if options['scale']:
+            call_command('setup_fake_data', scale=options['scale'], stdout=self.stdout)
+
+        overrides = {}
+        if options['budgets']:
+            with open(options['budgets']) as budgets_file:
+                overrides = json.load(budgets_file)
+
+        endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['only'] or endpoint[0] in options['only']
+        ]
+        results = []
+        # Writes are rolled back, so runs are repeatable and leave the data alone.
+        with transaction.atomic():
+            self.clients = self.get_clients()
+            for name, user, method, path, data, expected_status, query_budget in endpoints:
+                budget = {'queries': query_budget, 'p95_ms': options['latency_budget'], **overrides.get(name, {})}
+                result = self.measure(user, method, path, data, options['warmup'], options['repeat'])
+                result['failures'] = self.check_budget(result, expected_status, budget)
+                results.append({'name': name, 'method': method.upper(), 'path': path, **result, 'budget': budget})
+                self.stdout.write(
+                    f"{name:<34} {result['status']:>4} {result['queries']:>4}q "
+                    f"p50 {result['p50_ms']:>8.2f} p95 {result['p95_ms']:>8.2f} p99 {result['p99_ms']:>8.2f} ms "
+                    f"{result['peak_kib']:>9.1f} KiB"
+                    + (f"  FAIL: {'; '.join(result['failures'])}" if result['failures'] else '')
+                )
+            transaction.set_rollback(True)
+
+        report = {
+            'database': connection.vendor,
+            'cart_store': type(get_cart_store()).__name__,
+            'rows': {model._meta.model_name: model.objects.count() for model in [Product, Category, Comment, Customer, Order]},
+            'repeat': options['repeat'],
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+            output_file.write('\n')
+        self.stdout.write(f"Wrote {options['output']}")
+
+        failed = [result['name'] for result in results if result['failures']]
+        if failed:
+            raise CommandError(f"Budgets exceeded for {', '.join(failed)}")
+
+    def get_clients(self):
+        customer = Customer.objects.filter(orders__isnull=False).select_related('user').first()
+        if customer is None:
+            raise CommandError("No customer with orders, run setup_fake_data first.")
+        admin, _ = get_user_model().objects.get_or_create(
+            username='bench_admin',
+            defaults={'email': 'bench_admin@example.com', 'is_staff': True, 'is_superuser': True},
+        )
+        # Staff get permissions through a group rather than is_superuser, so
+        # permission checks do load them.
+        staff, _ = get_user_model().objects.get_or_create(
+            username='bench_staff',
+            defaults={'email': 'bench_staff@example.com', 'is_staff': True},
+        )
+        group, _ = Group.objects.get_or_create(name='Bench staff')
+        group.permissions.add(Permission.objects.get(content_type__app_label='store', codename='send_private_email'))
+        staff.groups.add(group)
+        clients = {}
+        users = [(None, None), ('customer', customer.user), ('admin', admin), ('staff', staff)]
+        for user_type, user in users:
+            # A non-internal address keeps the debug toolbar out of the measurements.
+            client = APIClient(SERVER_NAME='localhost', REMOTE_ADDR='203.0.113.1')
+            # Real tokens, so authentication is measured like in production.
+            if user is not None:
+                token = CustomerTokenObtainPairSerializer.get_token(user).access_token
+                client.credentials(HTTP_AUTHORIZATION=f'JWT {token}')
+            clients[user_type] = client
+        self.user_ids = [user.id for _, user in users[1:]]
+
+        product = Product.objects.filter(inventory__gte=10).order_by('id').first()
+        # Only approved comments are public.
+        comment = Comment.approved.order_by('id').values('id', 'product_id').first()
+        self.ids = {
+            'search': product.name.split()[0],
+            'product': product.id,
+            'products': list(Product.objects.filter(inventory__gte=10).order_by('id').values_list('id', flat=True)[:5]),
+            'comment': comment['id'],
+            'comment_product': comment['product_id'],
+            'category': product.category_id,
+            'customer': customer.id,
+            'order': customer.orders.values_list('id', flat=True).first(),
+        }
+        return clients
+
+    def get_fixtures(self):
+        # Rows the request may change or delete are created fresh for every
+        # request, inside the savepoint that is rolled back after it.
+        store = get_cart_store()
+        cart = store.create_cart()
+        items = store.add_items(cart.id, {
+            product: 1 for product in Product.objects.filter(id__in=self.ids['products'][:3])
+        })
+        category = Category.objects.create(title='Benchmark category')
+        new_product = Product.objects.create(
+            name='Benchmark product', slug='benchmark-product', description='',
+            category_id=self.ids['category'], unit_price=1, inventory=1,
+        )
+        return {
+            **self.ids,
+            'cart': str(cart.id),
+            'cart_item': items[0].id,
+            'new_category': category.id,
+            'new_product': new_product.id,
+        }
+
+    def request(self, user, method, path, data):
+        store = get_cart_store()
+        with transaction.atomic():
+            ids = self.get_fixtures()
+            cache.clear()
+            # Only the response cache starts cold. A client's user row and
+            # permissions stay cached between its requests.
+            for user_id in self.user_ids:
+                get_cached_user(user_id).get_all_permissions()
+            # Counted by a wrapper rather than from connection.queries, which
+            # keeps only the last queries_limit entries and would read 0 once
+            # full. The log is still emptied so DEBUG runs don't fill it.
+            connection.queries_log.clear()
+            query_count = 0
+
+            def count_query(execute, sql, params, many, context):
+                nonlocal query_count
+                query_count += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_query):
+                start = time.perf_counter()
+                response = getattr(self.clients[user], method)(
+                    path.format(**ids), data(ids) if data else None, format='json',
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+            if connection.queries_log.maxlen and len(connection.queries_log) >= connection.queries_log.maxlen:
+                raise CommandError(f"{method.upper()} {path} overflowed the query log with {query_count} queries")
+            transaction.set_rollback(True)
+        # Carts in Redis are not covered by the rollback.
+        store.delete_cart(ids['cart'])
+        return response.status_code, query_count, elapsed
+
+    def measure(self, user, method, path, data, warmup, repeat):
+        for _ in range(warmup):
+            self.request(user, method, path, data)
+
+        timings, query_counts = [], []
+        for _ in range(repeat):
+            status_code, query_count, elapsed = self.request(user, method, path, data)
+            timings.append(elapsed)
+            query_counts.append(query_count)
+
+        # Tracing slows every allocation down, so memory gets its own request.
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            self.request(user, method, path, data)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+        return {
+            'status': status_code,
+            'queries': max(query_counts),
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'max_ms': round(max(timings), 3),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def check_budget(self, result, expected_status, budget):
+        failures = []
+        if result['status'] != expected_status:
+            failures.append(f"status {result['status']} != {expected_status}")
+        if result['queries'] > budget['queries']:
+            failures.append(f"{result['queries']} queries > {budget['queries']}")
+        if result['p95_ms'] > budget['p95_ms']:
+            failures.append(f"p95 {result['p95_ms']}ms > {budget['p95_ms']}ms")
+        return failures
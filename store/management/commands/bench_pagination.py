@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from store.counters import rebuild_category_product_counts
+from store.models import Category, Product
+from store.paginations import DefaultPagination, KeysetPagination
+from store.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = "Compares page-number and keyset pagination latency across page depth on /store/products/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Bulk insert this many products before measuring')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--ordering', default='unit_price', help='One of name, unit_price, inventory (prefix - to reverse)')
+        parser.add_argument('--depths', default='1,10,100,1000,10000,100000', help='Comma separated page numbers')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed_products(options['seed'], options['batch_size'])
+
+        total = Product.objects.count()
+        page_size = DefaultPagination.page_size
+        ordering = options['ordering']
+        field = ordering.lstrip('-')
+        view = ProductViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+
+        self.stdout.write(f"{total} products, ordering={ordering}, page_size={page_size}")
+        self.stdout.write(f"{'page':>8} {'page-number ms':>16} {'keyset ms':>12}")
+        for depth in [int(page) for page in options['depths'].split(',')]:
+            offset = (depth - 1) * page_size
+            if offset >= total:
+                break
+
+            page_request = factory.get('/store/products/', {'page': depth, 'ordering': ordering})
+            page_ms = self.measure(view, page_request, options['repeat'])
+
+            cursor_params = {'ordering': ordering, 'pagination': 'cursor'}
+            if offset:
+                boundary = Product.objects \
+                    .order_by(ordering, ('-' if ordering.startswith('-') else '') + 'id') \
+                    .values(field, 'id')[offset - 1]
+                cursor_params['cursor'] = KeysetPagination().encode_cursor(boundary[field], boundary['id'])
+            keyset_request = factory.get('/store/products/', cursor_params)
+            keyset_ms = self.measure(view, keyset_request, options['repeat'])
+
+            self.stdout.write(f"{depth:>8} {page_ms:>16.2f} {keyset_ms:>12.2f}")
+
+    def measure(self, view, request, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    @transaction.atomic
+    def seed_products(self, count, batch_size):
+        category, _ = Category.objects.get_or_create(title='Benchmark')
+        self.stdout.write(f"Adding {count} products...", ending='')
+        for start in range(0, count, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    name=f'Benchmark product {number}',
+                    slug=f'benchmark-product-{number}',
+                    description='',
+                    category=category,
+                    unit_price=random.randint(100, 999999) / 100,
+                    inventory=random.randint(0, 100),
+                )
+                for number in range(start, min(start + batch_size, count))
+            ])
+        rebuild_category_product_counts()
+        self.stdout.write('DONE')
@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.test import APIRequestFactory
+
+from store.filters import ProductSearchFilter
+from store.models import Product
+from store.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = "Compares the icontains SearchFilter with the full-text ProductSearchFilter on /store/products/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='*', default=['shovel', 'garden tools', 'blue'])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        views = {
+            'icontains': ProductViewSet.as_view(
+                {'get': 'list'},
+                filter_backends=[SearchFilter, DjangoFilterBackend, OrderingFilter],
+            ),
+            'fulltext': ProductViewSet.as_view(
+                {'get': 'list'},
+                filter_backends=[ProductSearchFilter, DjangoFilterBackend, OrderingFilter],
+            ),
+        }
+
+        self.stdout.write(f"{Product.objects.count()} products")
+        self.stdout.write(f"{'term':<24} {'icontains ms':>14} {'fulltext ms':>12} {'matches':>9}")
+        for term in options['terms']:
+            timings = {}
+            for name, view in views.items():
+                request = factory.get('/store/products/', {'search': term})
+                samples = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    response = view(request)
+                    response.render()
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[name] = statistics.median(samples)
+            self.stdout.write(
+                f"{term:<24} {timings['icontains']:>14.2f} {timings['fulltext']:>12.2f} {response.data['count']:>9}"
+            )
@@ -0,0 +1,107 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from store.carts import get_cart_store
+from store.models import Category, Customer, Order, OrderItem, Product
+from store.row_serializers import OrderForAdminRowSerializer, ProductRowSerializer, serialize_cart
+from store.serializers import CartSerializer, OrderForAdminSerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Compares ModelSerializer and .values() row serialization of products, orders and carts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,10000', help='Comma separated row counts')
+        parser.add_argument('--cart-sizes', default='10,100', help='Comma separated items per cart')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        cart_sizes = [int(size) for size in options['cart_sizes'].split(',')]
+        # Rows are added as needed and rolled back afterwards.
+        with transaction.atomic():
+            self.seed(max(sizes + cart_sizes), cart_sizes)
+            cases = {
+                'products': (
+                    lambda size: ProductSerializer(Product.objects.select_related('category').order_by('id')[:size], many=True).data,
+                    lambda size: self.rows(ProductRowSerializer, Product.objects.order_by('id')[:size]),
+                ),
+                'orders (admin)': (
+                    lambda size: OrderForAdminSerializer(self.orders()[:size], many=True).data,
+                    lambda size: self.rows(OrderForAdminRowSerializer, self.orders()[:size]),
+                ),
+                'cart items': (
+                    lambda size: CartSerializer(get_cart_store().get_cart(self.carts[size])).data,
+                    lambda size: serialize_cart(get_cart_store().get_cart(self.carts[size])),
+                ),
+            }
+            self.stdout.write(f"{'case':<16} {'rows':>7} {'serializer ms':>14} {'rows ms':>10} {'speedup':>8}")
+            for name, (model_path, row_path) in cases.items():
+                for size in cart_sizes if name == 'cart items' else sizes:
+                    model_ms = self.measure(model_path, size, options['repeat'])
+                    row_ms = self.measure(row_path, size, options['repeat'])
+                    self.stdout.write(f"{name:<16} {size:>7} {model_ms:>14.2f} {row_ms:>10.2f} {model_ms / row_ms:>7.1f}x")
+            transaction.set_rollback(True)
+        # Carts in Redis are not covered by the rollback.
+        for cart_id in self.carts.values():
+            get_cart_store().delete_cart(cart_id)
+
+    def orders(self):
+        return Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        ).select_related('customer__user').order_by('-datetime_created')
+
+    def rows(self, serializer_class, queryset):
+        serializer = serializer_class()
+        return serializer.to_representation(serializer.get_rows(queryset))
+
+    def measure(self, path, size, repeat):
+        renderer = JSONRenderer()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            renderer.render(path(size))
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def seed(self, count, cart_sizes):
+        category, _ = Category.objects.get_or_create(title='Serializer benchmark')
+        missing = count - Product.objects.count()
+        if missing > 0:
+            Product.objects.bulk_create([
+                Product(
+                    name=f'Serializer benchmark product {number}',
+                    slug=f'serializer-benchmark-product-{number}',
+                    description='',
+                    category=category,
+                    unit_price=random.randint(100, 999999) / 100,
+                    inventory=random.randint(0, 100),
+                )
+                for number in range(missing)
+            ], batch_size=1000)
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:count])
+
+        missing = count - Order.objects.count()
+        if missing > 0:
+            user, _ = get_user_model().objects.get_or_create(username='serializer_benchmark', defaults={'email': 'serializer_benchmark@example.com'})
+            customer, _ = Customer.objects.get_or_create(user=user)
+            Order.objects.bulk_create([Order(customer=customer) for _ in range(missing)], batch_size=1000)
+            OrderItem.objects.bulk_create([
+                OrderItem(order_id=order_id, product_id=product_id, quantity=1, unit_price=1)
+                for order_id in customer.orders.values_list('id', flat=True)
+                for product_id in random.sample(product_ids, 3)
+            ], batch_size=1000)
+
+        store = get_cart_store()
+        self.carts = {}
+        for size in cart_sizes:
+            cart = store.create_cart()
+            store.add_items(cart.id, dict.fromkeys(Product.objects.filter(id__in=product_ids[:size]), 1))
+            self.carts[size] = cart.id
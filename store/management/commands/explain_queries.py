@@ -0,0 +1,144 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from store.models import Comment, Customer, Product
+
+# The read endpoints of every store viewset, run against a database loaded by
+# setup_fake_data. Each SELECT they send is explained, and a full table scan
+# is flagged unless it reads a table listed here, which the endpoint lists
+# in full on purpose. A scan feeding a LIMIT with no sort stops early and is
+# not flagged.
+SCENARIOS = [
+    # name, user, path, tables that may be scanned
+    ('product-list', None, '/store/products/', []),
+    ('product-list-by-price', None, '/store/products/?ordering=unit_price', []),
+    ('product-list-by-name', None, '/store/products/?ordering=-name', []),
+    ('product-list-cursor-by-price', None, '/store/products/?pagination=cursor&ordering=unit_price', []),
+    ('product-inventory-range', None, '/store/products/?inventory__lt=5', []),
+    ('product-inventory-range-cursor', None, '/store/products/?pagination=cursor&inventory__gt=90&ordering=inventory', []),
+    ('product-detail', None, '/store/products/{product}/', []),
+    ('comment-list', None, '/store/products/{comment_product}/comments/', []),
+    ('comment-detail', None, '/store/products/{comment_product}/comments/{comment}/', []),
+    ('category-list', None, '/store/categories/', ['store_category']),
+    ('customer-list', 'admin', '/store/customers/', ['store_customer']),
+    ('customer-me', 'customer', '/store/customers/me/', []),
+    ('order-list', 'customer', '/store/orders/', []),
+    ('order-list-cursor', 'customer', '/store/orders/?pagination=cursor', []),
+    ('order-list-admin-cursor', 'admin', '/store/orders/?pagination=cursor', []),
+    ('order-detail', 'customer', '/store/orders/{order}/', []),
+    ('analytics-by-product', 'admin', '/store/analytics/?group_by=product', ['store_dailyproductsales']),
+]
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the queries of every store list and detail endpoint and fails on unexpected full table scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', help='Scenario names to run')
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['only'] or scenario[0] in options['only']
+        ]
+        # Scans of derived tables (subqueries) are covered by the plan of
+        # what they select from.
+        self.tables = set(connection.introspection.table_names())
+        failed = []
+        # The admin user is created inside the transaction and rolled back.
+        with transaction.atomic():
+            clients, ids = self.get_clients()
+            for name, user, path, allowed_scans in scenarios:
+                status_code, statements = self.capture(clients[user], path.format(**ids))
+                if status_code != 200:
+                    raise CommandError(f"{name} returned {status_code}")
+
+                problems = []
+                for sql, params in statements:
+                    plan = self.explain(sql, params)
+                    scans, sorted_ = self.read_plan(plan)
+                    limited = re.search(r'\bLIMIT\b', sql) is not None
+                    scans = [table for table in scans if table in self.tables and table not in allowed_scans]
+                    if scans and (sorted_ or not limited):
+                        problems.append((sql, plan, scans))
+
+                self.stdout.write(
+                    f"{name:<32} {len(statements):>3} queries"
+                    + (f"  FULL SCAN: {', '.join(table for _, _, scans in problems for table in scans)}" if problems else '  ok')
+                )
+                for sql, plan, _ in problems if options['verbosity'] > 1 else []:
+                    self.stdout.write(f"    {sql}")
+                    for row in plan:
+                        self.stdout.write(f"      {row}")
+                if problems:
+                    failed.append(name)
+            transaction.set_rollback(True)
+
+        if failed:
+            raise CommandError(f"Full table scans in {', '.join(failed)}")
+
+    def get_clients(self):
+        customer = Customer.objects.filter(orders__isnull=False).select_related('user').first()
+        comment = Comment.approved.order_by('id').values('id', 'product_id').first()
+        if customer is None or comment is None:
+            raise CommandError("No customer with orders or approved comment, run setup_fake_data first.")
+        admin, _ = get_user_model().objects.get_or_create(
+            username='explain_admin',
+            defaults={'email': 'explain_admin@example.com', 'is_staff': True, 'is_superuser': True},
+        )
+        clients = {}
+        for user_type, user in [(None, None), ('customer', customer.user), ('admin', admin)]:
+            client = APIClient(SERVER_NAME='localhost', REMOTE_ADDR='203.0.113.1')
+            client.force_authenticate(user)
+            clients[user_type] = client
+        ids = {
+            'product': Product.objects.order_by('id').values_list('id', flat=True).first(),
+            'comment': comment['id'],
+            'comment_product': comment['product_id'],
+            'order': customer.orders.values_list('id', flat=True).first(),
+        }
+        return clients, ids
+
+    def capture(self, client, path):
+        statements = []
+
+        def collect(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(collect):
+            response = client.get(path)
+        return response.status_code, statements
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def read_plan(self, plan):
+        # Returns the fully scanned tables and whether rows get sorted.
+        scans, sorted_ = [], False
+        for row in plan:
+            if connection.vendor == 'mysql':
+                if row['type'] == 'ALL':
+                    scans.append(row['table'])
+                sorted_ |= 'filesort' in (row['Extra'] or '')
+            elif connection.vendor == 'postgresql':
+                line = row['QUERY PLAN']
+                match = re.search(r'Seq Scan on (\S+)', line)
+                if match:
+                    scans.append(match.group(1))
+                sorted_ |= re.search(r'(^|->  )Sort\b', line) is not None
+            else:
+                detail = row['detail']
+                match = re.match(r'SCAN (\w+)$', detail)
+                if match:
+                    scans.append(match.group(1))
+                sorted_ |= 'TEMP B-TREE' in detail
+        return scans, sorted_
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.exports import OrderExportFilterSerializer, export_orders, get_export_queryset
+
+
+class Command(BaseCommand):
+    help = "Streams orders and their items as NDJSON or CSV, with the same filters as /store/orders/export/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file-format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--date-from', help='YYYY-MM-DD, inclusive')
+        parser.add_argument('--date-to', help='YYYY-MM-DD, inclusive')
+        parser.add_argument('--status', nargs='+', default=[])
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--output', help='File to write, stdout by default')
+
+    def handle(self, *args, **options):
+        filters = OrderExportFilterSerializer(data={
+            key: options[key] for key in ['file_format', 'date_from', 'date_to', 'status', 'chunk_size']
+            if options[key]
+        })
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+        validated = filters.validated_data
+
+        queryset = get_export_queryset(validated.get('date_from'), validated.get('date_to'), validated.get('status'))
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for line in export_orders(queryset, validated['file_format'], validated['chunk_size']):
+                output.write(line)
+        finally:
+            if options['output']:
+                output.close()
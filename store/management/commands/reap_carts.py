@@ -0,0 +1,48 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.carts import get_cart_store
+
+
+class Command(BaseCommand):
+    help = "Deletes carts idle for longer than STORE_CART_TTL, with their items, in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, help='Seconds without item changes, defaults to STORE_CART_TTL')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds between batches, to leave room for other writes')
+        parser.add_argument('--every', type=float, help='Keep running and reap again every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.monotonic()
+            self.reap(options)
+            if options['every'] is None:
+                break
+            time.sleep(max(options['every'] - (time.monotonic() - start), 0))
+
+    def reap(self, options):
+        store = get_cart_store()
+        ttl = options['ttl'] if options['ttl'] is not None else settings.STORE_CART_TTL
+        # Fixed for the whole run, so carts going idle meanwhile wait for the next one.
+        idle_since = timezone.now() - datetime.timedelta(seconds=ttl)
+        carts = items = 0
+        start = time.perf_counter()
+        while True:
+            deleted_carts, deleted_items = store.delete_idle_carts(idle_since, options['batch_size'])
+            if not deleted_carts:
+                break
+            carts += deleted_carts
+            items += deleted_items
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Deleted {carts} carts and {items} items so far.")
+            time.sleep(options['pause'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Reaped {carts} carts and {items} items idle since {idle_since:%Y-%m-%d %H:%M} in {elapsed:.2f}s, "
+            f"{(carts + items) / elapsed:.0f} rows/s."
+        )
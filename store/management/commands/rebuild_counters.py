@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.counters import rebuild_category_product_counts, rebuild_product_comment_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuilds denormalized counters from the source tables"
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        updated = rebuild_category_product_counts()
+        self.stdout.write(f"Rebuilt product counts of {updated} categories.")
+        updated = rebuild_product_comment_counts()
+        self.stdout.write(f"Rebuilt comment counts of {updated} products.")
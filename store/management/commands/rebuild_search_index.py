@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store.models import Product
+from store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the product full-text search index"
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        backend = get_search_backend()
+        if backend is None:
+            raise CommandError("No search backend is available for this database.")
+        backend.create_index()
+        backend.rebuild()
+        self.stdout.write(f"Indexed {Product.objects.count()} products with {type(backend).__name__}.")
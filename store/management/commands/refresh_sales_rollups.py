@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.analytics import refresh_sales_rollups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the daily sales rollups for the days of orders created or changed since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Ignore the watermark and rebuild every day')
+        parser.add_argument('--lag', type=int, default=60, help='Seconds of recent changes left for the next run')
+        parser.add_argument('--days-per-batch', type=int, default=31)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        days, rows = refresh_sales_rollups(options['lag'], options['days_per_batch'], options['full'])
+        self.stdout.write(
+            f"Refreshed {len(days)} days ({rows} product rows) in {time.perf_counter() - start:.2f}s."
+        )
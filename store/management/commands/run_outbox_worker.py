@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.outbox import claim_batch, process_event
+
+
+def run_event(event_id, max_attempts, retry_delay):
+    try:
+        return process_event(event_id, max_attempts, retry_delay)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Delivers pending outbox events to their signal receivers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--retry-delay', type=int, default=30, help='Seconds before the first retry, doubled on each attempt')
+        parser.add_argument('--lease', type=int, default=300, help='Seconds a claimed batch is hidden from other workers')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Exit when no events are pending')
+
+    def handle(self, *args, **options):
+        use_processes = options['pool'] == 'process'
+        pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+        with pool_class(max_workers=options['workers']) as pool:
+            while True:
+                event_ids = claim_batch(options['batch_size'], options['lease'])
+                if not event_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                if use_processes:
+                    # Forked workers must not share the parent's connection.
+                    connections.close_all()
+
+                start = time.perf_counter()
+                results = list(pool.map(
+                    run_event,
+                    event_ids,
+                    [options['max_attempts']] * len(event_ids),
+                    [options['retry_delay']] * len(event_ids),
+                ))
+                elapsed = time.perf_counter() - start
+                delivered = sum(results)
+                self.stdout.write(
+                    f"Delivered {delivered} of {len(event_ids)} events in {elapsed:.2f}s, "
+                    f"{len(event_ids) - delivered} failed."
+                )
@@ -1,29 +1,27 @@
-import random
-from faker import Faker
-from datetime import datetime, timedelta
-
-import pytz
-from django.db import transaction
-from django.utils import timezone
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
 from django.core.management.base import BaseCommand
-
-from store.models import Address, Cart, CartItem, Category, Comment, Order, OrderItem, Product, Discount, Customer
-from store.factories import (
-    CartFactory,
-    CategoryFactory,
-    CommentFactory,
-    OrderItemFactory,
-    ProductFactory,
-    DiscountFactory,
-    CustomerFactory,
-    AddressFactory,
-    OrderFactory,
-    CartItemFactory,
-)
-
-faker = Faker()
-
-list_of_models = [CartItem, Cart, OrderItem, Order, Product, Category, Comment, Discount, Address, Customer]
+from django.core.management.color import no_style
+from django.db import connection
+
+from core.authentication import forget_users
+from store import fake_rows
+from store.caching import bump_version
+from store.analytics import refresh_sales_rollups
+from store.counters import rebuild_category_product_counts
+from store.models import Address, Cart, CartItem, Category, Comment, Order, OrderItem, Product, Discount, Customer, DailyCategorySales, DailyProductSales, RollupWatermark
+from store.search import get_search_backend
+
+list_of_models = [
+    DailyProductSales, DailyCategorySales, RollupWatermark,
+    CartItem, Cart, OrderItem, Order, Product, Category, Comment, Discount, Address, Customer,
+]
 
 NUM_CATEGORIES = 100
 NUM_DISCOUNTS = 10
@@ -32,100 +30,151 @@ NUM_CUSTOMERS = 100
 NUM_ORDERS = 30
 NUM_CARTS = 100
 
+ROW_MODELS = {
+    'category': Category,
+    'discount': Discount,
+    'product': Product,
+    'comment': Comment,
+    'user': get_user_model(),
+    'customer': Customer,
+    'address': Address,
+    'order': Order,
+    'orderitem': OrderItem,
+    'cart': Cart,
+    'cartitem': CartItem,
+}
+
+# Generated rows carry their own timestamps, which auto_now would overwrite.
+TIMESTAMP_FIELDS = [
+    (Product, 'datetime_created'),
+    (Product, 'datetime_modified'),
+    (Comment, 'datetime_created'),
+    (Order, 'datetime_created'),
+]
+
+
+@contextmanager
+def generated_timestamps():
+    fields = [model._meta.get_field(name) for model, name in TIMESTAMP_FIELDS]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
 class Command(BaseCommand):
     help = "Generates fake data"
 
-    @transaction.atomic
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1, help='Multiplies every base row count')
+        parser.add_argument('--products', type=int, help='Overrides the scaled number of products')
+        parser.add_argument('--customers', type=int, help='Overrides the scaled number of customers')
+        parser.add_argument('--orders', type=int, help='Overrides the scaled number of orders')
+        parser.add_argument('--carts', type=int, help='Overrides the scaled number of carts')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per generated chunk and INSERT')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes generating rows')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        num_categories = max(1, int(NUM_CATEGORIES * scale))
+        num_discounts = max(1, int(NUM_DISCOUNTS * scale))
+        num_products = options['products'] or max(1, int(NUM_PRODUCTS * scale))
+        num_customers = options['customers'] or max(1, int(NUM_CUSTOMERS * scale))
+        num_orders = options['orders'] or max(1, int(NUM_ORDERS * scale))
+        num_carts = options['carts'] or max(1, int(NUM_CARTS * scale))
+        self.batch_size = options['batch_size']
+        self.seed = options['seed']
+        self.workers = options['workers']
+        self.row_counts = {}
+
         self.stdout.write("Deleting old data...")
-        models = list_of_models
-        for m in models:
-            m.objects.all().delete()
+        self.delete_old_data()
 
         self.stdout.write("Creating new data...\n")
-
-        tz = timezone.get_current_timezone()
-
-        # Categories data
-        print(f"Adding {NUM_CATEGORIES} categories...", end='')
-        all_categories = [CategoryFactory(top_product=None) for _ in range(NUM_CATEGORIES)]
-        print('DONE')
-        
-        # Discounts data
-        print(f"Adding {NUM_DISCOUNTS} discounts...", end='')
-        all_discounts = [DiscountFactory() for _ in range(NUM_DISCOUNTS)]
-        print('DONE')
-
-        # Products data
-        print(f"Adding {NUM_PRODUCTS} product...", end='')
-        all_products = list()
-        for _ in range(NUM_PRODUCTS):
-            new_product = ProductFactory(category_id=random.choice(all_categories).id)
-            new_product.datetime_created = datetime(random.randrange(2019, 2023),random.randint(1,12),random.randint(1,12), tzinfo=pytz.utc)
-            new_product.datetime_modified = new_product.datetime_created + timedelta(hours=random.randint(1, 500))
-            new_product.save()
-            all_products.append(new_product)
-        print('DONE')
-
-        # Customers data
-        print(f"Adding {NUM_CUSTOMERS} customers...", end='')
-        all_customers = [(CustomerFactory() if (random.random() > 0.3) else CustomerFactory(birth_date=None)) for _ in range(NUM_CUSTOMERS) ]
-        print('DONE')
-
-        # Addresses data
-        print(f"Adding customers addresses...", end='')
-        all_addresses = [
-            AddressFactory(customer_id=customer.id) for customer in all_customers
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as self.pool, generated_timestamps():
+            self.load(f"{num_categories} categories", fake_rows.category_rows, num_categories)
+            self.load(f"{num_discounts} discounts", fake_rows.discount_rows, num_discounts)
+            self.load(
+                f"{num_products} products and their comments", fake_rows.product_rows, num_products,
+                num_categories, [status for status, _ in Comment.COMMENT_STATUS],
+                Comment.COMMENT_STATUS_APPROVED, Comment.COMMENT_STATUS_WAITING,
+            )
+            self.load(
+                f"{num_customers} customers and addresses", fake_rows.customer_rows, num_customers,
+                self.first_free_user_id(), UNUSABLE_PASSWORD_PREFIX,
+            )
+            self.load(
+                f"{num_orders} orders and their items", fake_rows.order_rows, num_orders,
+                num_customers, num_products, [Order.ORDER_STATUS_UNPAID, Order.ORDER_STATUS_CANCELED],
+            )
+            self.load(f"{num_carts} carts and their items", fake_rows.cart_rows, num_carts, num_products)
+
+        self.stdout.write("Rebuilding derived data...", ending='')
+        self.rebuild_derived_data()
+        self.stdout.write('DONE')
+
+        elapsed = time.perf_counter() - start
+        total = sum(self.row_counts.values())
+        for label, count in self.row_counts.items():
+            self.stdout.write(f"  {label:<10} {count:>12}")
+        self.stdout.write(f"Inserted {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s).")
+
+    def delete_old_data(self):
+        tables = [model._meta.db_table for model in list_of_models]
+        tables.append(Product.discounts.through._meta.db_table)
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, reset_sequences=True))
+        get_user_model().objects.filter(username__startswith=fake_rows.FAKE_USERNAME_PREFIX).delete()
+        # The flush skips the signals, and the remaining users' cached rows
+        # still carry the ids of the flushed customers.
+        forget_users(get_user_model().objects.values_list('id', flat=True))
+
+    def first_free_user_id(self):
+        last_user = get_user_model().objects.order_by('-id').values_list('id', flat=True).first()
+        return (last_user or 0) + 1
+
+    def load(self, label, generate, count, *args):
+        self.stdout.write(f"Adding {label}...", ending='')
+        self.stdout.flush()
+        start = time.perf_counter()
+        inserted = 0
+        chunks = [
+            (chunk_start, min(self.batch_size, count - chunk_start + 1), self.seed + chunk_start, *args)
+            for chunk_start in range(1, count + 1, self.batch_size)
         ]
-        print('DONE')
-
-        # Orders data
-        print(f"Adding {NUM_ORDERS} orders...", end='')
-        all_orders = [OrderFactory(
-            customer_id=random.choice(all_customers).id
-        ) for _ in range(NUM_ORDERS)]
-        for order in all_orders:
-            order.datetime_created =  datetime(random.randrange(2019, 2023),random.randint(1,12),random.randint(1,12), tzinfo=pytz.utc)
-            order.save()
-        print('DONE')
-
-        # OrderItems data
-        print(f"Adding order items...", end='')
-        all_order_items = list()
-        for order in all_orders:
-            products = random.sample(all_products, random.randint(1, 10))
-            for product in products:
-                order_item = OrderItemFactory(
-                    order_id=order.id,
-                    product_id=product.id,
-                    unit_price=product.unit_price,
-                )
-                all_order_items.append(order_item)
-        print('DONE')
-
-        # Comments data
-        print(f"Adding product comments...", end='')
-        for product in all_products:
-            for _ in range(random.randint(1, 5)):
-                comment = CommentFactory(product_id=product.id)
-                comment.datetime_created = datetime(random.randrange(2019, 2023),random.randint(1,12),random.randint(1,12), tzinfo=pytz.utc)
-                comment.save()
-        print('DONE')
-
-        # Carts data
-        print(f"Adding {NUM_CARTS} carts...", end='')
-        all_carts = [CartFactory() for _ in range(NUM_CARTS)]
-        print('DONE')
-
-        # CartItems data
-        print(f"Adding cart items...", end='')
-        all_cart_items = list()
-        for cart in all_carts:
-            products = random.sample(all_products, random.randint(1, 10))
-            for product in products:
-                cart_item = CartItemFactory(
-                    cart_id=cart.id,
-                    product_id=product.id,
-                )
-                all_cart_items.append(cart_item)
-        print('DONE')
\ No newline at end of file
+        for rows in self.bounded_map(generate, chunks):
+            for name, values in rows.items():
+                model = ROW_MODELS[name]
+                model.objects.bulk_create([model(**value) for value in values], batch_size=self.batch_size)
+                self.row_counts[name] = self.row_counts.get(name, 0) + len(values)
+                inserted += len(values)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"DONE ({inserted} rows, {inserted / elapsed:.0f} rows/s)")
+
+    def bounded_map(self, function, chunks):
+        # Keeps only a few chunks in flight so memory stays flat at any scale.
+        pending = deque()
+        for chunk in chunks:
+            pending.append(self.pool.submit(function, *chunk))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def rebuild_derived_data(self):
+        rebuild_category_product_counts()
+        refresh_sales_rollups(lag_seconds=0, full=True)
+        search_backend = get_search_backend()
+        if search_backend is not None:
+            search_backend.rebuild()
+        for model in [Product, Category, Discount]:
+            bump_version(model._meta.label_lower)
+        statements = connection.ops.sequence_reset_sql(no_style(), list(ROW_MODELS.values()))
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_product_counts(apps, schema_editor):
+    Category = apps.get_model('store', 'Category')
+    Product = apps.get_model('store', 'Product')
+    product_counts = Product.objects \
+        .filter(category_id=OuterRef('pk')) \
+        .order_by() \
+        .values('category_id') \
+        .annotate(count=Count('id')) \
+        .values('count')
+    Category.objects.update(product_count=Coalesce(Subquery(product_counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_remove_customer_first_name_remove_customer_last_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_product_counts, migrations.RunPython.noop),
+    ]
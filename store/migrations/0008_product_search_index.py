@@ -0,0 +1,67 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The index DDL is written out here instead of calling store.search, so the
+# migration keeps doing the same thing when the backends change.
+CREATE_INDEX_SQL = {
+    'sqlite': (
+        'CREATE VIRTUAL TABLE IF NOT EXISTS store_product_search '
+        'USING fts5(product_id UNINDEXED, name, category_title)'
+    ),
+    'mysql': (
+        'CREATE TABLE IF NOT EXISTS store_product_search ('
+        'product_id BIGINT NOT NULL PRIMARY KEY, '
+        'name VARCHAR(255) NOT NULL, '
+        'category_title VARCHAR(255) NOT NULL, '
+        'FULLTEXT KEY store_product_search_text (name, category_title)'
+        ') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+    ),
+}
+
+DOCUMENTS_SQL = 'FROM store_product p INNER JOIN store_category c ON c.id = p.category_id'
+
+FILL_INDEX_SQL = {
+    'sqlite': (
+        'INSERT INTO store_product_search (rowid, product_id, name, category_title) '
+        f'SELECT p.id, p.id, p.name, c.title {DOCUMENTS_SQL}'
+    ),
+    'mysql': (
+        'REPLACE INTO store_product_search (product_id, name, category_title) '
+        f'SELECT p.id, p.name, c.title {DOCUMENTS_SQL}'
+    ),
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor in CREATE_INDEX_SQL:
+        schema_editor.execute(CREATE_INDEX_SQL[vendor])
+        schema_editor.execute(FILL_INDEX_SQL[vendor])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INDEX_SQL:
+        schema_editor.execute('DROP TABLE IF EXISTS store_product_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_category_product_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='store.product')),
+                ('name', models.CharField(max_length=255)),
+                ('category_title', models.CharField(max_length=255)),
+            ],
+            options={
+                'db_table': 'store_product_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
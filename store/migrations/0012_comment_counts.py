@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_comment_counts(apps, schema_editor):
+    Comment = apps.get_model('store', 'Comment')
+    Product = apps.get_model('store', 'Product')
+
+    def comment_counts(status):
+        return Comment.objects \
+            .filter(product_id=OuterRef('pk'), status=status) \
+            .order_by() \
+            .values('product_id') \
+            .annotate(count=Count('id')) \
+            .values('count')
+
+    Product.objects.update(
+        approved_comment_count=Coalesce(Subquery(comment_counts('a')), Value(0)),
+        pending_comment_count=Coalesce(Subquery(comment_counts('w')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='approved_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='pending_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['product', 'status', 'datetime_created'], name='store_comme_product_fd5c95_idx'),
+        ),
+        migrations.RunPython(populate_comment_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:46
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_last_activity(apps, schema_editor):
+    # Item changes were never recorded, so carts start from their creation.
+    Cart = apps.get_model('store', 'Cart')
+    Cart.objects.update(last_activity=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_store_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='last_activity',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(populate_last_activity, migrations.RunPython.noop),
+    ]
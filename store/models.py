@@ -1,12 +1,14 @@
-from django.db import models
+from django.db import connections, models, transaction
 from django.core.validators import MinValueValidator
 from django.conf import settings
+from django.utils import timezone
 from uuid import uuid4
 
 class Category(models.Model):
     title = models.CharField(max_length=255)
     description = models.CharField(max_length=500, blank=True)
     top_product = models.ForeignKey('Product', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    product_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
@@ -30,10 +32,40 @@ class Product(models.Model):
     datetime_created = models.DateTimeField(auto_now_add=True)
     datetime_modified = models.DateTimeField(auto_now=True)
     discounts = models.ManyToManyField(Discount, blank=True)
+    # Kept up to date by the comment signal handlers, see store.counters.
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False)
+    pending_comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Inventory ranges (ProductFilter, InventoryFilter) and the
+            # ordering fields, with id for keyset pagination's tiebreak.
+            models.Index(fields=['inventory', 'id']),
+            models.Index(fields=['unit_price', 'id']),
+            models.Index(fields=['name', 'id']),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored category so moves can be counted on save.
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
+
+class ProductSearchDocument(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.DO_NOTHING, primary_key=True, related_name='search_document')
+    name = models.CharField(max_length=255)
+    category_title = models.CharField(max_length=255)
+
+    class Meta:
+        # Created and kept in sync by the backends in store.search.
+        managed = False
+        db_table = 'store_product_search'
+
 
 class Customer(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.PROTECT,)
@@ -74,11 +106,25 @@ class Order(models.Model):
     
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name='orders')
     datetime_created = models.DateTimeField(auto_now_add=True)
+    # Also bumped by queryset updates of the order or its items, the sales
+    # rollups reprocess orders changed since their last run.
+    datetime_modified = models.DateTimeField(auto_now=True, db_index=True)
     status = models.CharField(max_length=1, choices=ORDER_STATUS, default=ORDER_STATUS_UNPAID)
+    # Denormalized from the items, set at checkout (see store.counters).
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    item_count = models.PositiveIntegerField(default=0, editable=False)
 
     objects = models.Manager()
     unpaid_orders = UnpaidOrderManger()
 
+    class Meta:
+        indexes = [
+            # A customer's orders newest first, and every order newest first
+            # or in a date range (admin, exports, sales rollups).
+            models.Index(fields=['customer', 'datetime_created', 'id']),
+            models.Index(fields=['datetime_created', 'id']),
+        ]
+
     def __str__(self):
         return f'Order id={self.id}'
 
@@ -122,16 +168,134 @@ class Comment(models.Model):
     objects = CommentManger()
     approved = ApprovedCommentManager()
 
+    class Meta:
+        indexes = [
+            # Serves a product's comments of one status, newest first.
+            models.Index(fields=['product', 'status', 'datetime_created']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored product and status so changes can be counted on save.
+        instance._loaded_product_id = instance.__dict__.get('product_id')
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
 
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Moved forward by the cart store on every item change. Carts idle for
+    # longer than STORE_CART_TTL are deleted by the reap_carts command.
+    last_activity = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class CartItemManager(models.Manager):
+    # Adds {product_id: quantity} to a cart in a single INSERT that increments
+    # the rows already present on the (cart, product) unique key.
+    def add_quantities(self, cart_id, quantities):
+        connection = connections[self.db]
+        table = self.model._meta.db_table
+        cart_id = self.model._meta.get_field('cart').get_db_prep_value(cart_id, connection)
+        rows = [(cart_id, product_id, quantity) for product_id, quantity in quantities.items()]
+        if not rows:
+            return
+
+        if connection.vendor == 'mysql':
+            on_conflict = 'ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)'
+        elif connection.vendor in ('sqlite', 'postgresql'):
+            on_conflict = (
+                'ON CONFLICT (cart_id, product_id) '
+                f'DO UPDATE SET quantity = {table}.quantity + excluded.quantity'
+            )
+        else:
+            with transaction.atomic(using=self.db):
+                for _, product_id, quantity in rows:
+                    updated = self.filter(cart_id=cart_id, product_id=product_id) \
+                        .update(quantity=models.F('quantity') + quantity)
+                    if not updated:
+                        self.create(cart_id=cart_id, product_id=product_id, quantity=quantity)
+            return
+
+        placeholders = ', '.join(['(%s, %s, %s)'] * len(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (cart_id, product_id, quantity) VALUES {placeholders} {on_conflict}',
+                [value for row in rows for value in row],
+            )
 
 
 class CartItem(models.Model):
+    # The largest PositiveSmallIntegerField value on every backend.
+    MAX_QUANTITY = 32767
+
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cart_items')
     quantity = models.PositiveSmallIntegerField()
 
+    objects = CartItemManager()
+
+    class Meta:
+        unique_together = [['cart', 'product']]
+
+
+class OutboxEvent(models.Model):
+    STATUS_PENDING = 'p'
+    STATUS_DONE = 'd'
+    STATUS_DEAD = 'x'
+    STATUS = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    event = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=1, choices=STATUS, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Receivers that already got the event, skipped when it is retried.
+    delivered_to = models.JSONField(default=list, blank=True)
+    datetime_created = models.DateTimeField(auto_now_add=True)
+    datetime_processed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.event} id={self.id}'
+
+
+# Sales per product and per category and day, kept up to date from the orders
+# by store.analytics.refresh_sales_rollups. Canceled orders are left out.
+class DailyProductSales(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    units = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = [['day', 'product']]
+
+
+class DailyCategorySales(models.Model):
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    units = models.PositiveIntegerField()
+
     class Meta:
-        unique_together = [['cart', 'product']]
\ No newline at end of file
+        unique_together = [['day', 'category']]
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.name} at {self.value}'
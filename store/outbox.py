@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Order, OutboxEvent
+from .signals import order_created
+
+EVENTS = {}
+
+
+# Maps an outbox event name to the signal it is delivered through, the
+# sender (a dotted path is imported on delivery), and a function turning the
+# stored JSON payload back into the signal kwargs.
+def register(event, signal, sender, load_kwargs):
+    EVENTS[event] = (signal, sender, load_kwargs)
+
+
+# Sent by the viewset, as before the outbox, so receivers connected with
+# sender=OrderViewSet still get it.
+register('order_created', order_created, 'store.views.OrderViewSet', lambda payload: {
+    'order': Order.objects.get(pk=payload['order_id']),
+})
+
+
+def publish(event, **payload):
+    if event not in EVENTS:
+        raise KeyError(f'Unknown outbox event {event!r}')
+    return OutboxEvent.objects.create(event=event, payload=payload)
+
+
+def receiver_name(receiver):
+    return f'{receiver.__module__}.{receiver.__qualname__}'
+
+
+# Calls the receivers like send_robust(), but skips those in delivered_to and
+# adds the ones that succeed, so a retry only runs the receivers that failed.
+# Raises the first error once every receiver has been tried.
+def dispatch(outbox_event):
+    signal, sender, load_kwargs = EVENTS[outbox_event.event]
+    if isinstance(sender, str):
+        sender = import_string(sender)
+    kwargs = load_kwargs(outbox_event.payload)
+    # send_robust() can't leave receivers out, so this walks the live ones.
+    sync_receivers, async_receivers = signal._live_receivers(sender)
+    receivers = [(receiver, receiver) for receiver in sync_receivers]
+    receivers += [(receiver, async_to_sync(receiver)) for receiver in async_receivers]
+
+    first_error = None
+    for receiver, call in receivers:
+        name = receiver_name(receiver)
+        if name in outbox_event.delivered_to:
+            continue
+        try:
+            call(signal=signal, sender=sender, **kwargs)
+        except Exception as error:
+            first_error = first_error or error
+        else:
+            outbox_event.delivered_to.append(name)
+    if first_error is not None:
+        raise first_error
+
+
+def claim_batch(batch_size, lease_seconds):
+    # Pushing available_at forward leases the batch to this worker. Events of
+    # a worker that dies mid-batch become available again once it runs out.
+    now = timezone.now()
+    with transaction.atomic():
+        event_ids = list(
+            OutboxEvent.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=OutboxEvent.STATUS_PENDING, available_at__lte=now)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+        )
+        OutboxEvent.objects \
+            .filter(id__in=event_ids) \
+            .update(available_at=now + timedelta(seconds=lease_seconds))
+    return event_ids
+
+
+def process_event(event_id, max_attempts, retry_delay):
+    outbox_event = OutboxEvent.objects.get(pk=event_id)
+    try:
+        dispatch(outbox_event)
+    except Exception as error:
+        attempts = outbox_event.attempts + 1
+        dead = attempts >= max_attempts
+        OutboxEvent.objects.filter(pk=event_id).update(
+            attempts=attempts,
+            status=OutboxEvent.STATUS_DEAD if dead else OutboxEvent.STATUS_PENDING,
+            available_at=timezone.now() + timedelta(seconds=retry_delay * 2 ** (attempts - 1)),
+            last_error=f'{type(error).__name__}: {error}',
+            delivered_to=outbox_event.delivered_to,
+        )
+        return False
+
+    OutboxEvent.objects.filter(pk=event_id).update(
+        attempts=F('attempts') + 1,
+        status=OutboxEvent.STATUS_DONE,
+        delivered_to=outbox_event.delivered_to,
+        datetime_processed=timezone.now(),
+    )
+    return True
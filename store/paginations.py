@@ -1,5 +1,206 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class DefaultPagination(PageNumberPagination):
     page_size = 10
-    
\ No newline at end of file
+
+
+# The row count the database keeps in its table statistics, which costs one
+# catalog lookup instead of scanning the table. None where there is no such
+# estimate (SQLite, or a PostgreSQL table that was never analyzed).
+def estimate_row_count(model, using='default'):
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+# Django paginator for admin changelists. An unfiltered changelist of a table
+# above STORE_ADMIN_COUNT_ESTIMATE_THRESHOLD rows shows the estimate instead
+# of running COUNT(*) over the whole table. Filtered and smaller lists keep
+# the exact count.
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.STORE_ADMIN_COUNT_ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+# Seeks past the last row's (ordering field, id) instead of using OFFSET, so
+# deep pages cost the same as the first one. COUNT(*) only runs on ?count=true.
+class KeysetPagination(BasePagination):
+    page_size = 10
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    default_ordering = 'id'
+    tiebreak_field = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        self.field = self.ordering.lstrip('-')
+        self.descending = self.ordering.startswith('-')
+
+        ordering = [self.ordering]
+        if self.field != self.tiebreak_field:
+            ordering.append(('-' if self.descending else '') + self.tiebreak_field)
+        queryset = queryset.order_by(*ordering)
+
+        self.count = queryset.count() if self.count_requested(request) else None
+
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_seek_filter(*cursor))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_ordering(self, queryset):
+        for ordering in queryset.query.order_by:
+            if isinstance(ordering, str) and ordering.lstrip('-') != 'pk':
+                return ordering
+            break
+        return self.default_ordering
+
+    def get_seek_filter(self, value, pk):
+        lookup, bound = ('lt', 'lte') if self.descending else ('gt', 'gte')
+        if self.field == self.tiebreak_field:
+            return Q(**{f'{self.field}__{lookup}': value})
+        return Q(**{f'{self.field}__{bound}': value}) & (
+            Q(**{f'{self.field}__{lookup}': value}) | Q(**{f'{self.tiebreak_field}__{lookup}': pk})
+        )
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def encode_cursor(self, value, pk):
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.isoformat()
+        elif value is not None and not isinstance(value, (int, float)):
+            value = str(value)
+        raw = json.dumps([value, pk]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            # A cursor that decodes can still hold values of the wrong type,
+            # which would only fail once the seek filter runs.
+            return self.to_python(model, self.field, value), self.to_python(model, self.tiebreak_field, pk)
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, model, field_name, value):
+        field = model._meta.get_field(field_name)
+        value = field.to_python(value)
+        if value is None:
+            raise ValidationError('Cursor values cannot be null.')
+        # Includes the integer range checks for the database backend.
+        field.run_validators(value)
+        return value
+
+    def get_row_value(self, row, field):
+        # Rows are model instances, or dicts when the view pages .values().
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, field)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(
+            self.get_row_value(self.last_row, self.field),
+            self.get_row_value(self.last_row, self.tiebreak_field),
+        )
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'count': {
+                    'type': 'integer',
+                },
+                'results': schema,
+            },
+        }
+
+
+# A product's comments, newest first, seeking along the
+# (product, status, datetime_created) index.
+class CommentPagination(KeysetPagination):
+    page_size = 20
+    default_ordering = '-datetime_created'
+
+
+# ?pagination=cursor (or a cursor link) switches a viewset to keyset pages.
+class KeysetPaginationModeMixin:
+    keyset_pagination_class = KeysetPagination
+    pagination_mode_query_param = 'pagination'
+
+    def uses_keyset_pagination(self):
+        query_params = self.request.query_params
+        return query_params.get(self.pagination_mode_query_param) == 'cursor' \
+            or self.keyset_pagination_class.cursor_query_param in query_params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.uses_keyset_pagination():
+                self._paginator = self.keyset_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
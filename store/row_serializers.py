@@ -0,0 +1,171 @@
+from collections import defaultdict
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .models import OrderItem
+from .serializers import price_after_tax, price_in_rials
+
+# Read-only serializers that build the same output as the ModelSerializers
+# straight from .values() rows, without creating model instances or running
+# DRF's per-field machinery for every row.
+
+datetime_field = serializers.DateTimeField()
+
+
+class RowSerializer:
+    fields = []
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def get_rows(self, queryset):
+        # Annotations are kept since filters may order by them (search_rank),
+        # and keyset pagination reads the ordering field off the last row.
+        return queryset.prefetch_related(None).values(*self.fields, *queryset.query.annotations)
+
+    def to_representation(self, rows):
+        raise NotImplementedError
+
+
+class ProductRowSerializer(RowSerializer):
+    fields = ['id', 'name', 'unit_price', 'category__title', 'inventory', 'description', 'approved_comment_count']
+
+    def to_representation(self, rows):
+        return [
+            {
+                'id': row['id'],
+                'title': row['name'],
+                'price': row['unit_price'],
+                'category': row['category__title'],
+                'unit_price_after_tax': price_after_tax(row['unit_price']),
+                'inventory': row['inventory'],
+                'description': row['description'],
+                'price_rials': price_in_rials(row['unit_price']),
+                'comment_count': row['approved_comment_count'],
+            }
+            for row in rows
+        ]
+
+
+class CategoryRowSerializer(RowSerializer):
+    fields = ['id', 'title', 'description', 'product_count']
+
+    def to_representation(self, rows):
+        return [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'description': row['description'],
+                'num_top_product': row['product_count'],
+            }
+            for row in rows
+        ]
+
+
+class OrderRowSerializer(RowSerializer):
+    fields = ['id', 'status', 'datetime_created', 'total_price', 'item_count']
+
+    def get_items(self, rows):
+        # One query for the items of the whole page, like the prefetch.
+        items = defaultdict(list)
+        item_rows = OrderItem.objects \
+            .filter(order_id__in=[row['id'] for row in rows]) \
+            .values('id', 'order_id', 'quantity', 'unit_price', 'product_id', 'product__name', 'product__unit_price')
+        for item in item_rows:
+            items[item['order_id']].append({
+                'id': item['id'],
+                'product': {
+                    'id': item['product_id'],
+                    'name': item['product__name'],
+                    'unit_price': item['product__unit_price'],
+                },
+                'quantity': item['quantity'],
+                'unit_price': item['unit_price'],
+            })
+        return items
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        items = self.get_items(rows)
+        return [
+            {
+                'id': row['id'],
+                'status': row['status'],
+                'datetime_created': datetime_field.to_representation(row['datetime_created']),
+                'total_price': row['total_price'],
+                'item_count': row['item_count'],
+                'items': items[row['id']],
+            }
+            for row in rows
+        ]
+
+
+class OrderForAdminRowSerializer(OrderRowSerializer):
+    fields = OrderRowSerializer.fields + [
+        'customer_id', 'customer__user__first_name', 'customer__user__last_name', 'customer__user__email',
+    ]
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        items = self.get_items(rows)
+        return [
+            {
+                'id': row['id'],
+                'customer': {
+                    'id': row['customer_id'],
+                    'first_name': row['customer__user__first_name'],
+                    'last_name': row['customer__user__last_name'],
+                    'email': row['customer__user__email'],
+                },
+                'status': row['status'],
+                'datetime_created': datetime_field.to_representation(row['datetime_created']),
+                'total_price': row['total_price'],
+                'item_count': row['item_count'],
+                'items': items[row['id']],
+            }
+            for row in rows
+        ]
+
+
+# Same output as CartItemSerializer and CartSerializer. Carts come from the
+# cart store rather than a queryset, so these read the loaded items instead
+# of .values() rows.
+def serialize_cart_item(item):
+    return {
+        'id': item.id,
+        'product': {
+            'id': item.product.id,
+            'name': item.product.name,
+            'unit_price': item.product.unit_price,
+        },
+        'quantity': item.quantity,
+        'item_total': item.quantity * item.product.unit_price,
+    }
+
+
+def serialize_cart(cart):
+    items = [serialize_cart_item(item) for item in cart.items.all()]
+    return {
+        'id': str(cart.id),
+        'items': items,
+        'total_price': sum([item['item_total'] for item in items]),
+    }
+
+
+# Serves list actions through get_row_serializer_class() instead of the
+# ModelSerializer. Everything else (filters, pagination) stays the same.
+class RowListMixin:
+    row_serializer_class = None
+
+    def get_row_serializer_class(self):
+        return self.row_serializer_class
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.get_row_serializer_class()(context=self.get_serializer_context())
+        rows = row_serializer.get_rows(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.to_representation(page))
+        return Response(row_serializer.to_representation(rows))
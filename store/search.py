@@ -0,0 +1,176 @@
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+# The index is a side table (ProductSearchDocument) holding the product name
+# and its category title, so a single full-text index covers both columns.
+class BaseSearchBackend:
+    table = 'store_product_search'
+    product_table = 'store_product'
+    category_table = 'store_category'
+    document_columns = 'p.id, p.name, c.title'
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def execute(self, sql, params=None):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def documents_sql(self, where=''):
+        return (
+            f'SELECT {self.document_columns} FROM {self.product_table} p '
+            f'INNER JOIN {self.category_table} c ON c.id = p.category_id {where}'
+        )
+
+    def in_clause(self, ids):
+        return ', '.join(['%s'] * len(ids))
+
+    def get_tokens(self, terms):
+        return re.findall(r'\w+', terms)
+
+    def get_query(self, tokens):
+        raise NotImplementedError
+
+    def create_index(self):
+        raise NotImplementedError
+
+    def drop_index(self):
+        self.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def index_products(self, product_ids):
+        raise NotImplementedError
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            self.execute(f'DELETE FROM {self.table} WHERE product_id IN ({self.in_clause(product_ids)})', product_ids)
+
+    def reindex_category(self, category_id, title):
+        self.execute(
+            f'UPDATE {self.table} SET category_title = %s '
+            f'WHERE product_id IN (SELECT id FROM {self.product_table} WHERE category_id = %s)',
+            [title, category_id],
+        )
+
+    def rebuild(self):
+        self.execute(f'DELETE FROM {self.table}')
+        self.execute(self.insert_sql() + self.documents_sql())
+
+    def insert_sql(self):
+        raise NotImplementedError
+
+    def match_expression(self, query):
+        raise NotImplementedError
+
+    def rank_expression(self, query):
+        raise NotImplementedError
+
+    # Filters to products matching every term and annotates search_rank,
+    # where higher is more relevant.
+    def search(self, queryset, terms):
+        tokens = self.get_tokens(terms)
+        if not tokens:
+            return queryset.none()
+        query = self.get_query(tokens)
+        return queryset \
+            .filter(search_document__isnull=False) \
+            .filter(self.match_expression(query)) \
+            .annotate(search_rank=self.rank_expression(query))
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    # The product id is stored both as the FTS rowid and as a column to join on.
+    document_columns = 'p.id, p.id, p.name, c.title'
+
+    def create_index(self):
+        self.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} '
+            'USING fts5(product_id UNINDEXED, name, category_title)'
+        )
+
+    def insert_sql(self):
+        return f'INSERT INTO {self.table} (rowid, product_id, name, category_title) '
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        self.execute(f'DELETE FROM {self.table} WHERE rowid IN ({self.in_clause(product_ids)})', product_ids)
+        self.execute(
+            self.insert_sql() + self.documents_sql(f'WHERE p.id IN ({self.in_clause(product_ids)})'),
+            product_ids,
+        )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            self.execute(f'DELETE FROM {self.table} WHERE rowid IN ({self.in_clause(product_ids)})', product_ids)
+
+    def get_query(self, tokens):
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def match_expression(self, query):
+        return RawSQL(f'{self.table} MATCH %s', [query], output_field=BooleanField())
+
+    def rank_expression(self, query):
+        # bm25() is lower for better matches.
+        return RawSQL(f'-bm25({self.table})', [], output_field=FloatField())
+
+
+class MySQLFulltextBackend(BaseSearchBackend):
+    def create_index(self):
+        self.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} ('
+            'product_id BIGINT NOT NULL PRIMARY KEY, '
+            'name VARCHAR(255) NOT NULL, '
+            'category_title VARCHAR(255) NOT NULL, '
+            f'FULLTEXT KEY {self.table}_text (name, category_title)'
+            ') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+        )
+
+    def insert_sql(self):
+        return f'REPLACE INTO {self.table} (product_id, name, category_title) '
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            self.execute(
+                self.insert_sql() + self.documents_sql(f'WHERE p.id IN ({self.in_clause(product_ids)})'),
+                product_ids,
+            )
+
+    def get_query(self, tokens):
+        return ' '.join(f'+{token}*' for token in tokens)
+
+    def match_sql(self):
+        return f'MATCH ({self.table}.name, {self.table}.category_title) AGAINST (%s IN BOOLEAN MODE)'
+
+    def match_expression(self, query):
+        return RawSQL(self.match_sql(), [query], output_field=BooleanField())
+
+    def rank_expression(self, query):
+        return RawSQL(self.match_sql(), [query], output_field=FloatField())
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'mysql': MySQLFulltextBackend,
+}
+
+
+def get_search_backend_class(using=DEFAULT_DB_ALIAS):
+    backend_path = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)
+    return SEARCH_BACKENDS.get(connections[using].vendor)
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    backend_class = get_search_backend_class(using)
+    return backend_class(using) if backend_class else None
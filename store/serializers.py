@@ -1,11 +1,15 @@
 from rest_framework import serializers  # type: ignore
+from . import outbox
+from .carts import CartItemQuantityExceeded, get_cart_store
+from .checkout import InsufficientInventory, place_order
 from .models import Customer, Order, OrderItem, Product, Category, Comment, Cart, CartItem
+from collections import defaultdict
 from decimal import Decimal
 from django.utils.text import slugify
 from django.db import transaction
 
 class CategorySerializer(serializers.ModelSerializer):
-    num_top_product = serializers.IntegerField(source = 'products.count', read_only = True)
+    num_top_product = serializers.IntegerField(source = 'product_count', read_only = True)
 
     class Meta:
         model = Category
@@ -13,21 +17,32 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 DOLLORS_TO_RIALS = 600000
+
+
+def price_after_tax(unit_price):
+    return round(unit_price * Decimal(1.09), 2)
+
+
+def price_in_rials(unit_price):
+    return int(unit_price * DOLLORS_TO_RIALS)
+
+
 class ProductSerializer(serializers.ModelSerializer):
     title = serializers.CharField(max_length=255, source='name')
     price = serializers.DecimalField(max_digits=6, decimal_places=2, source='unit_price')
     category = serializers.StringRelatedField()
     unit_price_after_tax = serializers.SerializerMethodField()
     price_rials = serializers.SerializerMethodField()
+    comment_count = serializers.IntegerField(source='approved_comment_count', read_only=True)
     class Meta:
         model = Product
-        fields = ['id', 'title', 'price', 'category', 'unit_price_after_tax', 'inventory', 'description', 'price_rials' ,]
+        fields = ['id', 'title', 'price', 'category', 'unit_price_after_tax', 'inventory', 'description', 'price_rials', 'comment_count' ,]
 
     def get_unit_price_after_tax(self, product):
-        return round(product.unit_price * Decimal(1.09), 2)    
+        return price_after_tax(product.unit_price)
     
     def get_price_rials(self,product):
-        return int(product.unit_price * DOLLORS_TO_RIALS)
+        return price_in_rials(product.unit_price)
     
      
     def create(self, validated_data):
@@ -42,6 +57,14 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['name', 'body', 'status', ]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # Only staff moderate. Everyone else's comments wait for approval.
+        request = self.context.get('request')
+        if request is None or not request.user.is_staff:
+            fields['status'].read_only = True
+        return fields
+
     def create(self, validated_data):
         product_id = self.context['product_pk']
         return Comment.objects.create(product_id=product_id, **validated_data)
@@ -58,6 +81,15 @@ class UpdateCartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ['quantity']
 
+    def update(self, instance, validated_data):
+        return get_cart_store().update_item(instance.cart_id, instance.id, validated_data['quantity'])
+
+
+def quantity_exceeded(error):
+    return serializers.ValidationError(
+        f'A cart can hold at most {CartItem.MAX_QUANTITY} of a product, products {error.product_ids} would go over.'
+    )
+
 
 class AddCartItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -71,16 +103,51 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         quantity = validated_data.get('quantity')
 
         try:
-            cart_item = CartItem.objects.get(cart_id=cart_id, product_id=product.id)
-            cart_item.quantity += quantity
-            cart_item.save()
-        except CartItem.DoesNotExist:
-            cart_item = CartItem.objects.create(cart_id=cart_id, **validated_data)
+            cart_item = get_cart_store().add_item(cart_id, product, quantity)
+        except Cart.DoesNotExist:
+            raise serializers.ValidationError('There is no cart with this cart id!')
+        except CartItemQuantityExceeded as error:
+            raise quantity_exceeded(error)
 
         self.instance = cart_item
         return cart_item
 
 
+class BulkAddCartItemListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        product_ids = {item['product'] for item in attrs}
+        products = Product.objects.in_bulk(product_ids)
+        missing = sorted(product_ids - products.keys())
+        if missing:
+            raise serializers.ValidationError(f'There is no product with id {missing}!')
+
+        # Rows of the same product are added up.
+        self.quantities = defaultdict(int)
+        for item in attrs:
+            item['product'] = products[item['product']]
+            self.quantities[item['product']] += item['quantity']
+        over = sorted(product.id for product, quantity in self.quantities.items() if quantity > CartItem.MAX_QUANTITY)
+        if over:
+            raise quantity_exceeded(CartItemQuantityExceeded(over))
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            return get_cart_store().add_items(self.context['cart_pk'], self.quantities)
+        except Cart.DoesNotExist:
+            raise serializers.ValidationError('There is no cart with this cart id!')
+        except CartItemQuantityExceeded as error:
+            raise quantity_exceeded(error)
+
+
+class BulkAddCartItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=CartItem.MAX_QUANTITY)
+
+    class Meta:
+        list_serializer_class = BulkAddCartItemListSerializer
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     product = CartProductSerializer()
     item_total = serializers.SerializerMethodField()
@@ -139,7 +206,7 @@ class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     class Meta:
         model = Order
-        fields = ['id',  'status', 'datetime_created', 'items']
+        fields = ['id',  'status', 'datetime_created', 'total_price', 'item_count', 'items']
         
 class OrderForAdminSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
@@ -147,7 +214,7 @@ class OrderForAdminSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'customer', 'status', 'datetime_created', 'items']
+        fields = ['id', 'customer', 'status', 'datetime_created', 'total_price', 'item_count', 'items']
 
 
 class OrderUpdateSerializer(serializers.ModelSerializer):
@@ -157,42 +224,39 @@ class OrderUpdateSerializer(serializers.ModelSerializer):
 
 
 class OrderCreateSerializer(serializers.Serializer):
+    # Only the shape of the id is validated here. The cart is read in save(),
+    # inside the checkout transaction.
     cart_id = serializers.UUIDField()
 
-    def validate_cart_id(self, cart_id):
-
-        if not Cart.objects.filter(id=cart_id).exists():
-            raise serializers.ValidationError('There is no cart with this cart id!')
-
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
-            raise serializers.ValidationError('Your cart is empty. Please add some products to it first!')
-
-        return cart_id
-    
+    def validate(self, attrs):
+        if self.context['customer_id'] is None:
+            raise serializers.ValidationError('There is no customer profile for this user.')
+        return attrs
 
     def save(self, **kwargs):
         with transaction.atomic():
             cart_id = self.validated_data['cart_id']
-            user_id = self.context['user_id']
-            customer = Customer.objects.get(user_id=user_id)
-
-            order = Order()
-            order.customer = customer
-            order.save()
-
-            cart_items = CartItem.objects.select_related('product').filter(cart_id=cart_id)
-
-            order_items = [
-                OrderItem(
-                    order=order,
-                    product=cart_item.product,
-                    unit_price=cart_item.product.unit_price,
-                    quantity=cart_item.quantity,
-                ) for cart_item in cart_items
-            ]
-
-            OrderItem.objects.bulk_create(order_items)
-
-            Cart.objects.get(id=cart_id).delete()
+            customer_id = self.context['customer_id']
+
+            # Read under the lock, so the order holds exactly what the cart
+            # holds when it is checked out.
+            cart = get_cart_store().lock_cart(cart_id)
+            if cart is None:
+                raise serializers.ValidationError({'cart_id': ['There is no cart with this cart id!']})
+            cart_items = cart.items.all()
+            if len(cart_items) == 0:
+                raise serializers.ValidationError({'cart_id': ['Your cart is empty. Please add some products to it first!']})
+
+            try:
+                order = place_order(customer_id, cart_items)
+            except InsufficientInventory as error:
+                raise serializers.ValidationError({'cart_id': [
+                    f'There is not enough inventory for products {error.product_ids}.'
+                ]})
+
+            if not get_cart_store().delete_cart(cart_id):
+                raise serializers.ValidationError({'cart_id': ['This cart has already been checked out.']})
+
+            outbox.publish('order_created', order_id=order.id)
 
             return order
\ No newline at end of file
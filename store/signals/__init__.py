@@ -1,3 +1,10 @@
+from contextvars import ContextVar
+
 from django.dispatch import Signal
 
-order_created = Signal()
\ No newline at end of file
+order_created = Signal()
+
+# Set while store.bulk_products deletes products. It updates the counters,
+# the search index and the cache version once per batch instead, so the
+# handlers skip the per-row work for products and their cascaded comments.
+bulk_product_delete = ContextVar('bulk_product_delete', default=False)
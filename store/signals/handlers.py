@@ -1,10 +1,100 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
+from django.db import transaction
 
-from store.models import Customer
+from store.caching import bump_version
+from store.counters import adjust_category_product_counts, adjust_product_comment_counts
+from store.models import Category, Comment, Customer, Discount, Product
+from store.search import get_search_backend
+from store.signals import bulk_product_delete
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_profile_for_newly_created_user(sender, instance, created, **kwargs):
     if created:
-        Customer.objects.create(user=instance)
\ No newline at end of file
+        Customer.objects.create(user=instance)
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous_category_id = getattr(instance, '_loaded_category_id', instance.category_id)
+    if created:
+        adjust_category_product_counts({instance.category_id: 1})
+    elif previous_category_id != instance.category_id:
+        adjust_category_product_counts({previous_category_id: -1, instance.category_id: 1})
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    if bulk_product_delete.get():
+        return
+    adjust_category_product_counts({instance.category_id: -1})
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = (
+        getattr(instance, '_loaded_product_id', instance.product_id),
+        getattr(instance, '_loaded_status', instance.status),
+    )
+    if created:
+        changes = [(instance.product_id, instance.status, 1)]
+    elif previous != (instance.product_id, instance.status):
+        changes = [(*previous, -1), (instance.product_id, instance.status, 1)]
+    else:
+        changes = []
+    for product_id, status, delta in changes:
+        adjust_product_comment_counts(product_id, {status: delta})
+    instance._loaded_product_id, instance._loaded_status = instance.product_id, instance.status
+    # Product responses show the approved count.
+    if any(status == Comment.COMMENT_STATUS_APPROVED for _, status, _ in changes):
+        transaction.on_commit(lambda: bump_version(Product._meta.label_lower))
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if bulk_product_delete.get():
+        return
+    adjust_product_comment_counts(instance.product_id, {instance.status: -1})
+    if instance.status == Comment.COMMENT_STATUS_APPROVED:
+        transaction.on_commit(lambda: bump_version(Product._meta.label_lower))
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend and not raw:
+        backend.index_products([instance.id])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend and not bulk_product_delete.get():
+        backend.remove_products([instance.id])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, raw, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend and not raw and not created:
+        backend.reindex_category(instance.id, instance.title)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Discount)
+def bump_catalog_version(sender, **kwargs):
+    if sender is Product and bulk_product_delete.get():
+        return
+    transaction.on_commit(lambda: bump_version(sender._meta.label_lower))
+
+
+@receiver(m2m_changed, sender=Product.discounts.through)
+def bump_product_discounts_version(sender, action, **kwargs):
+    if action.startswith('post_'):
+        transaction.on_commit(lambda: bump_version(Product._meta.label_lower))
@@ -1,3 +1,485 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+import fakeredis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from . import outbox
+from .carts import CartItemQuantityExceeded, ORMCartStore, RedisCartStore
+from .models import Cart, CartItem, Category, Comment, Customer, Order, OrderItem, OutboxEvent, Product
+from .serializers import OrderCreateSerializer
+from .signals import order_created
+from .views import OrderViewSet
+
+
+class ReplicaResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(title='Before')
+
+    # 'default' stands in for a replica, so both clients can read it.
+    @override_settings(STORE_READ_REPLICAS=['default'])
+    def test_primary_reads_skip_replica_entries(self):
+        replica_client = APIClient()
+        self.assertEqual(replica_client.get(f'/store/categories/{self.category.id}/').json()['title'], 'Before')
+
+        # A row the replica hasn't caught up with: changed without a version bump.
+        Category.objects.filter(pk=self.category.pk).update(title='After')
+
+        primary_client = APIClient()
+        primary_client.cookies['use_primary'] = '1'
+        self.assertEqual(primary_client.get(f'/store/categories/{self.category.id}/').json()['title'], 'After')
+
+
+def create_product(category, name='Mug', **fields):
+    fields = {'slug': name.lower(), 'description': '', 'unit_price': '9.50', 'inventory': 10, **fields}
+    return Product.objects.create(name=name, category=category, **fields)
+
+
+# Run against both stores by the subclasses below.
+class CartStoreTests:
+    def setUp(self):
+        cache.clear()
+        self.store = self.get_store()
+        category = Category.objects.create(title='Kitchen')
+        self.mug = create_product(category, 'Mug')
+        self.bowl = create_product(category, 'Bowl')
+        self.cart = self.store.create_cart()
+
+    def quantities(self, cart_id):
+        return {item.product.id: item.quantity for item in self.store.get_items(cart_id)}
+
+    def test_add_items(self):
+        item = self.store.add_item(self.cart.id, self.mug, 2)
+        self.assertEqual((item.product.id, item.quantity), (self.mug.id, 2))
+        self.store.add_items(self.cart.id, {self.bowl: 1})
+        self.assertEqual(self.quantities(self.cart.id), {self.mug.id: 2, self.bowl.id: 1})
+        self.assertEqual(len(self.store.get_cart(self.cart.id).items.all()), 2)
+
+    def test_adding_a_product_again_merges_quantities(self):
+        first = self.store.add_item(self.cart.id, self.mug, 2)
+        second = self.store.add_item(self.cart.id, self.mug, 3)
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(second.quantity, 5)
+        self.assertEqual(self.quantities(self.cart.id), {self.mug.id: 5})
+
+    def test_update_item(self):
+        item = self.store.add_item(self.cart.id, self.mug, 2)
+        self.assertEqual(self.store.update_item(self.cart.id, item.id, 7).quantity, 7)
+        self.assertEqual(self.store.get_item(self.cart.id, item.id).quantity, 7)
+
+    def test_remove_item(self):
+        item = self.store.add_item(self.cart.id, self.mug, 2)
+        self.store.add_item(self.cart.id, self.bowl, 1)
+        self.assertTrue(self.store.remove_item(self.cart.id, item.id))
+        self.assertFalse(self.store.remove_item(self.cart.id, item.id))
+        self.assertIsNone(self.store.get_item(self.cart.id, item.id))
+        self.assertEqual(self.quantities(self.cart.id), {self.bowl.id: 1})
+
+    def test_delete_cart(self):
+        self.store.add_item(self.cart.id, self.mug, 2)
+        self.assertTrue(self.store.delete_cart(self.cart.id))
+        self.assertFalse(self.store.delete_cart(self.cart.id))
+        self.assertIsNone(self.store.get_cart(self.cart.id))
+        self.assertEqual(self.store.get_items(self.cart.id), [])
+        with self.assertRaises(Cart.DoesNotExist):
+            self.store.add_item(self.cart.id, self.mug, 1)
+
+    def test_quantities_stay_within_the_limit(self):
+        self.store.add_item(self.cart.id, self.mug, 2)
+        with self.assertRaises(CartItemQuantityExceeded) as raised:
+            self.store.add_items(self.cart.id, {self.bowl: 1, self.mug: CartItem.MAX_QUANTITY - 1})
+        self.assertEqual(raised.exception.product_ids, [self.mug.id])
+        self.assertEqual(self.quantities(self.cart.id), {self.mug.id: 2})
+        self.assertEqual(self.store.add_item(self.cart.id, self.mug, CartItem.MAX_QUANTITY - 2).quantity, CartItem.MAX_QUANTITY)
+
+    def test_bad_ids(self):
+        self.store.add_item(self.cart.id, self.mug, 2)
+        self.assertIsNone(self.store.get_item(self.cart.id, 'abc'))
+        self.assertIsNone(self.store.get_item('nope', self.mug.id))
+        self.assertIsNone(self.store.get_cart('nope'))
+        self.assertEqual(self.store.get_items('nope'), [])
+        self.assertIsNone(self.store.get_cart(uuid4()))
+        with self.assertRaises(Cart.DoesNotExist):
+            self.store.add_item('nope', self.mug, 1)
+
+
+class ORMCartStoreTests(CartStoreTests, TestCase):
+    def get_store(self):
+        return ORMCartStore()
+
+    def make_idle(self, cart_id, days):
+        Cart.objects.filter(pk=cart_id).update(last_activity=timezone.now() - datetime.timedelta(days=days))
+
+    def test_idle_carts_are_deleted(self):
+        self.store.add_items(self.cart.id, {self.mug: 1, self.bowl: 1})
+        active = self.store.create_cart()
+        self.make_idle(self.cart.id, days=3)
+
+        idle_since = timezone.now() - datetime.timedelta(days=1)
+        self.assertEqual(self.store.delete_idle_carts(idle_since, batch_size=10), (1, 2))
+        self.assertEqual(self.store.delete_idle_carts(idle_since, batch_size=10), (0, 0))
+        self.assertIsNone(self.store.get_cart(self.cart.id))
+        self.assertIsNotNone(self.store.get_cart(active.id))
+
+    def test_item_writes_keep_a_cart_alive(self):
+        item = self.store.add_item(self.cart.id, self.mug, 1)
+        idle_since = timezone.now() - datetime.timedelta(days=1)
+        for write in [
+            lambda: self.store.add_item(self.cart.id, self.bowl, 1),
+            lambda: self.store.update_item(self.cart.id, item.id, 3),
+            lambda: self.store.remove_item(self.cart.id, item.id),
+        ]:
+            self.make_idle(self.cart.id, days=3)
+            write()
+            self.assertEqual(self.store.delete_idle_carts(idle_since, batch_size=10), (0, 0))
+
+
+class RedisCartStoreTests(CartStoreTests, TestCase):
+    def get_store(self):
+        return RedisCartStore(client=fakeredis.FakeRedis())
+
+    def ttl(self, cart_id):
+        return self.store.client.ttl(self.store.key(cart_id))
+
+    def test_item_writes_reset_the_expiry(self):
+        self.assertEqual(self.ttl(self.cart.id), settings.STORE_CART_TTL)
+        for write in [
+            lambda: self.store.add_item(self.cart.id, self.mug, 1),
+            lambda: self.store.update_item(self.cart.id, self.mug.id, 3),
+            lambda: self.store.remove_item(self.cart.id, self.mug.id),
+        ]:
+            self.store.client.expire(self.store.key(self.cart.id), 60)
+            write()
+            self.assertEqual(self.ttl(self.cart.id), settings.STORE_CART_TTL)
+
+    def test_expired_carts_are_gone(self):
+        self.store.add_item(self.cart.id, self.mug, 1)
+        # What Redis does once STORE_CART_TTL has passed.
+        self.store.client.delete(self.store.key(self.cart.id))
+        self.assertIsNone(self.store.get_cart(self.cart.id))
+        self.assertEqual(self.store.get_items(self.cart.id), [])
+        self.assertEqual(self.store.delete_idle_carts(timezone.now(), batch_size=10), (0, 0))
+
+
+class CartItemIdTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.cart_id = self.client.post('/store/carts/').json()['id']
+
+    def test_malformed_ids_are_not_found(self):
+        for url in [
+            f'/store/carts/{self.cart_id}/items/abc/',
+            '/store/carts/nope/',
+            '/store/carts/nope/items/1/',
+            f'/store/async/carts/{self.cart_id}/items/abc/',
+            '/store/async/carts/nope/',
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        # Like any unknown cart.
+        self.assertEqual(self.client.get('/store/carts/nope/items/').json(), [])
+        self.assertEqual(self.client.get('/store/async/carts/nope/items/').json(), [])
+
+    def test_quantity_limit(self):
+        product = create_product(Category.objects.create(title='Kitchen'))
+        url = f'/store/carts/{self.cart_id}/items/'
+        row = {'product': product.id, 'quantity': CartItem.MAX_QUANTITY}
+        self.assertEqual(self.client.post(f'{url}bulk/', [row, row], format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, row, format='json').status_code, 201)
+        self.assertEqual(self.client.post(url, {**row, 'quantity': 1}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(f'{url}bulk/', [{**row, 'quantity': 1}], format='json').status_code, 400)
+        self.assertEqual(self.client.get(url).json()[0]['quantity'], CartItem.MAX_QUANTITY)
+
+    def test_adding_to_a_malformed_cart_id(self):
+        response = self.client.post('/store/carts/nope/items/', {'product': 1, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetCursorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(title='Kitchen')
+        for index in range(12):
+            create_product(category, f'Mug {index}', unit_price=f'{index % 4}.50')
+        self.client = APIClient()
+
+    def get_page(self, cursor=None, url='/store/products/'):
+        params = {'ordering': 'unit_price', 'pagination': 'cursor'}
+        if cursor is not None:
+            params['cursor'] = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        return self.client.get(url, params)
+
+    def test_next_link(self):
+        first = self.get_page().json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        ids = [product['id'] for product in first['results'] + second['results']]
+        self.assertEqual(sorted(ids), sorted(Product.objects.values_list('id', flat=True)))
+
+    def test_invalid_cursors(self):
+        for cursor in [['abc', 'x'], ['1.50', 'x'], [None, 1], [[], 1], ['1.50', 2 ** 80], {'a': 1}, 'abc']:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.get_page(cursor).status_code, 404)
+                self.assertEqual(self.get_page(cursor, '/store/async/products/').status_code, 404)
+        self.assertEqual(self.client.get('/store/products/', {'cursor': '%%%'}).status_code, 404)
+
+
+class OrderCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pw-Secret-123')
+        self.customer_id = Customer.objects.get(user=user).id
+        category = Category.objects.create(title='Kitchen')
+        self.mug = create_product(category, 'Mug')
+        self.bowl = create_product(category, 'Bowl')
+        self.store = ORMCartStore()
+        self.cart = self.store.create_cart()
+
+    def get_serializer(self, cart_id):
+        serializer = OrderCreateSerializer(data={'cart_id': cart_id}, context={'customer_id': self.customer_id})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer
+
+    def test_items_are_read_at_checkout(self):
+        self.store.add_item(self.cart.id, self.mug, 1)
+        serializer = self.get_serializer(self.cart.id)
+        # Changed between validation and save.
+        self.store.add_item(self.cart.id, self.bowl, 2)
+        order = serializer.save()
+        self.assertEqual(
+            dict(order.items.values_list('product_id', 'quantity')), {self.mug.id: 1, self.bowl.id: 2},
+        )
+        self.assertIsNone(self.store.get_cart(self.cart.id))
+
+    def test_cart_emptied_after_validation(self):
+        item = self.store.add_item(self.cart.id, self.mug, 1)
+        serializer = self.get_serializer(self.cart.id)
+        self.store.remove_item(self.cart.id, item.id)
+        with self.assertRaisesMessage(ValidationError, 'Your cart is empty'):
+            serializer.save()
+        self.assertFalse(Order.objects.exists())
+
+    def test_unknown_cart(self):
+        serializer = self.get_serializer(uuid4())
+        with self.assertRaisesMessage(ValidationError, 'There is no cart with this cart id!'):
+            serializer.save()
+        serializer = OrderCreateSerializer(data={'cart_id': 'nope'}, context={'customer_id': self.customer_id})
+        self.assertFalse(serializer.is_valid())
+
+
+class BulkProductTests(TestCase):
+    url = '/store/products/bulk/'
+
+    def setUp(self):
+        cache.clear()
+        self.kitchen = Category.objects.create(title='Kitchen')
+        self.garden = Category.objects.create(title='Garden')
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def row(self, title, category, **fields):
+        return {'title': title, 'price': '4.50', 'category': category.id, 'inventory': 5, 'description': title, **fields}
+
+    def assertProductCounts(self):
+        for category in Category.objects.all():
+            self.assertEqual(category.product_count, category.products.count(), category.title)
+
+    def create(self, *rows):
+        response = self.client.post(self.url, list(rows), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return [product['id'] for product in response.json()]
+
+    def test_create_update_delete_keep_product_counts(self):
+        mug, bowl, rake = self.create(
+            self.row('Mug', self.kitchen), self.row('Bowl', self.kitchen), self.row('Rake', self.garden),
+        )
+        self.assertProductCounts()
+        self.assertEqual(Category.objects.get(pk=self.kitchen.pk).product_count, 2)
+
+        response = self.client.patch(self.url, [
+            {'id': bowl, 'category': self.garden.id}, {'id': mug, 'price': '5.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Product.objects.get(pk=bowl).category_id, self.garden.id)
+        self.assertProductCounts()
+
+        response = self.client.delete(self.url, {'ids': [bowl, rake]}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(list(Product.objects.values_list('id', flat=True)), [mug])
+        self.assertProductCounts()
+
+    def test_create_errors_match_rows(self):
+        response = self.client.post(self.url, [
+            self.row('Mug', self.kitchen), self.row('Bowl', self.kitchen, price='x'), self.row('Rake', Category(id=999)),
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(errors[0], {})
+        self.assertIn('price', errors[1])
+        self.assertIn('category', errors[2])
+        self.assertFalse(Product.objects.exists())
+        self.assertProductCounts()
+
+    def test_update_errors_match_rows(self):
+        mug, = self.create(self.row('Mug', self.kitchen))
+        response = self.client.patch(self.url, [
+            {'id': mug, 'category': self.garden.id}, {'id': 999}, {'id': mug}, {'title': 'No id'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        for index in [1, 2, 3]:
+            self.assertIn('id', errors[index])
+        self.assertEqual(Product.objects.get(pk=mug).category_id, self.kitchen.id)
+        self.assertProductCounts()
+
+    def test_delete_errors_match_ids(self):
+        mug, bowl = self.create(self.row('Mug', self.kitchen), self.row('Bowl', self.kitchen))
+        customer = Customer.objects.get(user__username='admin')
+        order = Order.objects.create(customer=customer)
+        OrderItem.objects.create(order=order, product_id=bowl, quantity=1, unit_price='4.50')
+
+        response = self.client.delete(self.url, {'ids': [mug, 999, bowl]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['ids']
+        self.assertEqual(set(errors), {'1', '2'})
+        self.assertIn('order items', errors['2'][0])
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertProductCounts()
+
+    def test_empty_payloads(self):
+        for method, data in [('post', []), ('patch', []), ('delete', {'ids': []})]:
+            with self.subTest(method=method):
+                response = getattr(self.client, method)(self.url, data, format='json')
+                self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, [], format='json')
+        self.assertEqual(response.json(), {'non_field_errors': ['Expected a non-empty list of products.']})
+        self.assertFalse(Product.objects.exists())
+
+
+class CommentModerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = create_product(Category.objects.create(title='Kitchen'))
+        self.url = f'/store/products/{self.product.id}/comments/'
+        self.client = APIClient()
+
+    def comment_count(self):
+        return self.client.get(f'/store/products/{self.product.id}/').json()['comment_count']
+
+    def test_anonymous_comments_wait_for_approval(self):
+        response = self.client.post(self.url, {'name': 'Sam', 'body': 'Great', 'status': 'a'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], Comment.COMMENT_STATUS_WAITING)
+        self.assertEqual(self.client.get(self.url).json()['results'], [])
+        self.assertEqual(self.comment_count(), 0)
+
+    def test_only_staff_moderate(self):
+        comment = Comment.objects.create(product=self.product, name='Sam', body='Great')
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+
+        self.assertIn(self.client.patch(f'{self.url}{comment.id}/', {'status': 'a'}, format='json').status_code, [401, 403])
+        self.client.force_authenticate(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'{self.url}{comment.id}/', {'status': 'a'}, format='json')
+        self.assertEqual(response.json()['status'], Comment.COMMENT_STATUS_APPROVED)
+
+        self.client.force_authenticate(None)
+        self.assertEqual([row['body'] for row in self.client.get(self.url).json()['results']], ['Great'])
+        self.assertEqual(self.comment_count(), 1)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pw-Secret-123')
+        self.order = Order.objects.create(customer=Customer.objects.get(user=user))
+        self.calls = []
+
+    def connect(self, receiver, **kwargs):
+        order_created.connect(receiver, **kwargs)
+        self.addCleanup(order_created.disconnect, receiver, **kwargs)
+
+    def process(self, event):
+        return outbox.process_event(event.id, max_attempts=3, retry_delay=0)
+
+    def test_receivers_connected_to_the_viewset(self):
+        def receiver(sender, order, **kwargs):
+            self.calls.append((sender, order.id))
+
+        self.connect(receiver, sender=OrderViewSet)
+        self.assertTrue(self.process(outbox.publish('order_created', order_id=self.order.id)))
+        self.assertEqual(self.calls, [(OrderViewSet, self.order.id)])
+
+    def test_retries_skip_delivered_receivers(self):
+        def notify(sender, order, **kwargs):
+            self.calls.append('notify')
+
+        def flaky(sender, order, **kwargs):
+            self.calls.append('flaky')
+            if self.calls.count('flaky') == 1:
+                raise RuntimeError('down')
+
+        self.connect(notify)
+        self.connect(flaky)
+        event = outbox.publish('order_created', order_id=self.order.id)
+        self.assertFalse(self.process(event))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (OutboxEvent.STATUS_PENDING, 1))
+        self.assertEqual(event.last_error, 'RuntimeError: down')
+
+        self.assertTrue(self.process(event))
+        self.assertEqual(self.calls, ['notify', 'flaky', 'flaky'])
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.STATUS_DONE)
+        self.assertEqual(len(event.delivered_to), 3)
+
+    def test_admin_retry_starts_over(self):
+        event = outbox.publish('order_created', order_id=self.order.id)
+        OutboxEvent.objects.filter(pk=event.pk).update(
+            status=OutboxEvent.STATUS_DEAD, attempts=3, last_error='RuntimeError: down',
+        )
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.post('/admin/store/outboxevent/', {'action': 'retry', '_selected_action': [event.pk]})
+        self.assertEqual(response.status_code, 302)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.last_error), (OutboxEvent.STATUS_PENDING, 0, ''))
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(title='Kitchen')
+        self.client = APIClient()
+
+    def search(self, terms):
+        return [product['title'] for product in self.client.get('/store/products/', {'search': terms}).json()['results']]
+
+    def test_index_follows_writes(self):
+        product = create_product(self.category, 'Blue mug')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.title = 'Tableware'
+            self.category.save()
+        self.assertEqual(self.search('tableware mug'), ['Blue mug'])
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.search('mug'), [])
+
+    def test_handlers_use_the_written_database(self):
+        product = create_product(self.category, 'Blue mug')
+        with mock.patch('store.signals.handlers.get_search_backend') as get_search_backend:
+            post_save.send(Product, instance=product, created=False, raw=False, using='other', update_fields=None)
+            post_save.send(Category, instance=self.category, created=False, raw=False, using='other', update_fields=None)
+        self.assertEqual([call.args for call in get_search_backend.call_args_list], [('other',), ('other',)])
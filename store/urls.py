@@ -1,6 +1,7 @@
+from django.urls import path
 from rest_framework_nested import routers
 
-from . import views
+from . import async_views, views
 
 router = routers.DefaultRouter()
 router.register('products', views.ProductViewSet, basename='product')
@@ -8,10 +9,21 @@ router.register('categories', views.CategoryViewSet, basename='category')
 router.register('carts', views.CartViewSet, basename='cart')
 router.register('customers', views.CustomerViewSet, basename='customer')
 router.register('orders', views.OrderViewSet, basename='order')
+router.register('analytics', views.SalesAnalyticsViewSet, basename='analytics')
 
 products_router = routers.NestedDefaultRouter(router, 'products', lookup='product')
 products_router.register('comments', views.CommentViewSet, basename='product-comments')
 
 cart_items_router = routers.NestedDefaultRouter(router, 'carts', lookup='cart')
 cart_items_router.register('items', views.CartItemViewSet, basename='cart-items')
-urlpatterns = router.urls + products_router.urls + cart_items_router.urls
\ No newline at end of file
+async_urlpatterns = [
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/categories/', async_views.category_list, name='async-category-list'),
+    path('async/categories/<int:pk>/', async_views.category_detail, name='async-category-detail'),
+    path('async/carts/<str:pk>/', async_views.cart_detail, name='async-cart-detail'),
+    path('async/carts/<str:cart_pk>/items/', async_views.cart_item_list, name='async-cart-items-list'),
+    path('async/carts/<str:cart_pk>/items/<str:pk>/', async_views.cart_item_detail, name='async-cart-items-detail'),
+]
+
+urlpatterns = async_urlpatterns + router.urls + products_router.urls + cart_items_router.urls
\ No newline at end of file
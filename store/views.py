@@ -1,9 +1,10 @@
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Prefetch
 
 from rest_framework.response import Response
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework import status # type: ignore
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, DestroyModelMixin
@@ -11,29 +12,40 @@ from rest_framework.viewsets import ModelViewSet # type: ignore
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.decorators import action
 
-from store.paginations import DefaultPagination
+from core.authentication import get_customer_id
+from store.analytics import SalesAnalyticsQuerySerializer, get_sales
+from store.bulk_products import BulkProductDeleteSerializer, BulkProductSerializer, BulkProductUpdateSerializer, serialize_products
+from store.caching import CachedResponseMixin
+from store.exports import CONTENT_TYPES, OrderExportFilterSerializer, export_orders, get_export_queryset
+from store.carts import get_cart_store
+from store.paginations import CommentPagination, DefaultPagination, KeysetPaginationModeMixin
 from store.permissions import SendPrivateEmailToCustomerPermission
-from .models import CartItem, Product, Customer, OrderItem, Order, Category, Customer, Comment, Cart
-from .serializers import AddCartItemSerializer, CartItemSerializer, CustomerSerializer, OrderCreateSerializer, OrderForAdminSerializer, OrderSerializer, OrderUpdateSerializer, ProductSerializer, CategorySerializer, CommentSerializer, CartSerializer, UpdateCartItemSerializer
+from store.row_serializers import OrderForAdminRowSerializer, OrderRowSerializer, ProductRowSerializer, RowListMixin, serialize_cart
+from .models import CartItem, Product, Customer, OrderItem, Order, Category, Customer, Comment, Cart, Discount
+from .serializers import AddCartItemSerializer, BulkAddCartItemSerializer, CartItemSerializer, CustomerSerializer, OrderCreateSerializer, OrderForAdminSerializer, OrderSerializer, OrderUpdateSerializer, ProductSerializer, CategorySerializer, CommentSerializer, CartSerializer, UpdateCartItemSerializer
 
-from .filters import ProductFilter
-from .signals import order_created
+from .filters import ProductFilter, ProductSearchFilter
 
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, ModelViewSet):
     serializer_class = CategorySerializer
-    queryset = Category.objects.prefetch_related('products').all()
+    use_read_replica = True
+    cache_models = [Category, Product]
+    queryset = Category.objects.all()
     def delete(self, request, pk):
-        category = get_object_or_404(Category.objects.prefetch_related('products'), pk=pk)
-        if category.products.count() > 0:
+        category = get_object_or_404(Category, pk=pk)
+        if category.products.exists():
             return Response({'error': 'There is some products relating this category. Please remove them first.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
         category.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(CachedResponseMixin, RowListMixin, KeysetPaginationModeMixin, ModelViewSet):
     serializer_class = ProductSerializer
+    row_serializer_class = ProductRowSerializer
+    use_read_replica = True
+    cache_models = [Product, Category, Discount]
     queryset = Product.objects.select_related('category').all()
-    filter_backends = [SearchFilter, DjangoFilterBackend, OrderingFilter]
+    filter_backends = [ProductSearchFilter, DjangoFilterBackend, OrderingFilter]
     ordering_fields = ['name', 'unit_price', 'inventory']
     search_fields = ['name', 'category__title']
     filterset_class = ProductFilter
@@ -48,22 +60,70 @@ class ProductViewSet(ModelViewSet):
         product.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    # For the catalog sync job, see store.bulk_products.
+    @action(detail=False, methods=['POST', 'PATCH', 'DELETE'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        if request.method == 'DELETE':
+            serializer = BulkProductDeleteSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'POST':
+            serializer = BulkProductSerializer(data=request.data, many=True)
+        else:
+            serializer = BulkProductUpdateSerializer(data=request.data, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        products = serializer.save()
+        return Response(
+            serialize_products(products),
+            status=status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK,
+        )
+
 class CommentViewSet(ModelViewSet):
     serializer_class = CommentSerializer
+    use_read_replica = True
+    pagination_class = CommentPagination
+
+    def get_permissions(self):
+        if self.request.method in ['PUT', 'PATCH', 'DELETE']:
+            return [IsAdminUser()]
+        return super().get_permissions()
+
     def get_queryset(self):
         product_pk = self.kwargs['product_pk']
-        return Comment.objects.filter(product_id=product_pk).all()
+        # Waiting and rejected comments are only visible to staff.
+        if self.request.user.is_staff:
+            return Comment.objects.filter(product_id=product_pk).all()
+        return Comment.approved.filter(product_id=product_pk).all()
     
     def get_serializer_context(self):
-        return {'product_pk': self.kwargs['product_pk']}
+        return {**super().get_serializer_context(), 'product_pk': self.kwargs['product_pk']}
     
 
 class CartItemViewSet(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
 
-    def get_queryset(self):
-        cart_pk = self.kwargs['cart_pk']
-        return CartItem.objects.select_related('product').filter(cart_id=cart_pk).all()
+    def get_object(self):
+        cart_item = get_cart_store().get_item(self.kwargs['cart_pk'], self.kwargs['pk'])
+        if cart_item is None:
+            raise Http404
+        return cart_item
+
+    def list(self, request, *args, **kwargs):
+        cart_items = get_cart_store().get_items(self.kwargs['cart_pk'])
+        serializer = self.get_serializer(cart_items, many=True)
+        return Response(serializer.data)
+
+    def perform_destroy(self, instance):
+        get_cart_store().remove_item(self.kwargs['cart_pk'], instance.id)
+
+    @action(detail=False, methods=['POST'])
+    def bulk(self, request, cart_pk):
+        serializer = BulkAddCartItemSerializer(data=request.data, many=True, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        cart_items = serializer.save()
+        return Response(CartItemSerializer(cart_items, many=True).data, status=status.HTTP_201_CREATED)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -83,6 +143,21 @@ class CartViewSet(CreateModelMixin,
     serializer_class = CartSerializer
     queryset = Cart.objects.prefetch_related('items__product').all()
 
+    def get_object(self):
+        cart = get_cart_store().get_cart(self.kwargs['pk'])
+        if cart is None:
+            raise Http404
+        return cart
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(serialize_cart(self.get_object()))
+
+    def perform_create(self, serializer):
+        serializer.instance = get_cart_store().create_cart()
+
+    def perform_destroy(self, instance):
+        get_cart_store().delete_cart(instance.id)
+
 
 class CustomerViewSet(ModelViewSet):
     serializer_class = CustomerSerializer
@@ -91,8 +166,9 @@ class CustomerViewSet(ModelViewSet):
 
     @action(detail=False, methods=['GET', 'PUT'], permission_classes=[IsAuthenticated])
     def me(self, request):
-        user_id = request.user.id
-        customer = Customer.objects.get(user_id=user_id)
+        customer = request.customer
+        if not customer:
+            raise Http404
         if request.method == 'GET':
             serializer = CustomerSerializer(customer)
             return Response(serializer.data)
@@ -108,11 +184,11 @@ class CustomerViewSet(ModelViewSet):
 
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(RowListMixin, KeysetPaginationModeMixin, ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete', 'options', 'head']
 
     def get_permissions(self):
-        if self.request.method in ['PATCH', 'DELETE']:
+        if self.request.method in ['PATCH', 'DELETE'] or self.action == 'export':
             return [IsAdminUser()]
         return [IsAuthenticated()]
     
@@ -122,14 +198,17 @@ class OrderViewSet(ModelViewSet):
                 'items',
                 queryset=OrderItem.objects.select_related('product'),
             )
-        ).select_related('customer__user').all()
+        ).select_related('customer__user').order_by('-datetime_created')
 
         user = self.request.user
 
         if user.is_staff:
             return queryset
         
-        return queryset.filter(customer__user_id=user.id)
+        customer_id = get_customer_id(user)
+        if customer_id is None:
+            return queryset.none()
+        return queryset.filter(customer_id=customer_id)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -142,16 +221,47 @@ class OrderViewSet(ModelViewSet):
             return OrderForAdminSerializer
         return OrderSerializer
 
+    def get_row_serializer_class(self):
+        if self.request.user.is_staff:
+            return OrderForAdminRowSerializer
+        return OrderRowSerializer
+
+    @action(detail=False, methods=['GET'])
+    def export(self, request):
+        filters = OrderExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        options = filters.validated_data
+
+        queryset = get_export_queryset(options.get('date_from'), options.get('date_to'), options.get('status'))
+        response = StreamingHttpResponse(
+            export_orders(queryset, options['file_format'], options['chunk_size']),
+            content_type=CONTENT_TYPES[options['file_format']],
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders.{options["file_format"]}"'
+        return response
     
     def create(self, request, *args, **kwargs):
         create_order_serializer = OrderCreateSerializer(
             data=request.data,
-            context={'user_id': self.request.user.id},
+            context={'customer_id': get_customer_id(self.request.user)},
         )
         create_order_serializer.is_valid(raise_exception=True)
         created_order = create_order_serializer.save()
 
-        order_created.send_robust(self.__class__, order=created_order)
-
         serializer = OrderSerializer(created_order)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class SalesAnalyticsViewSet(GenericViewSet):
+    permission_classes = [IsAdminUser]
+    pagination_class = DefaultPagination
+
+    def list(self, request):
+        query = SalesAnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        rows = get_sales(**query.validated_data)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)